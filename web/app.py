@@ -9,12 +9,26 @@ import subprocess
 import json
 import uuid
 import socket
+import hashlib
+import time
 import requests
 from pathlib import Path
+from urllib.parse import quote
 from flask import Flask, render_template, request, jsonify
 from werkzeug.utils import secure_filename
 import threading
 import signal
+from concurrent.futures import ThreadPoolExecutor
+from latency_profiles import (DEFAULT_LATENCY_PROFILE, LATENCY_PROFILES, resolve_latency_profile, latency_video_opts,
+                              webrtc_compatible)
+from camera_registry import CAMERA_MODES, DEFAULT_CAMERA_MODE, CameraRegistry, CameraUnreachableError, mask_url
+from cluster import SECRET_SPEC_FIELDS, ClusterNode, StreamAssignedError, open_cluster_store, store_spec
+from file_browser import FileBrowser
+from filters import compile_filter_graph, output_frame_rate, output_resolution, validate_filters
+from media_library import MediaLibrary
+from ratecontrol import (DEFAULT_RATE_CONTROL, RESOLUTION_TIERS, clamp_bitrate, format_bitrate, rate_control_opts,
+                         validate_rate_control)
+from readiness import Histogram, StreamReadiness, follow_process, parse_ready_time
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = '/streams'
@@ -22,10 +36,73 @@ app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024 * 1024  # 5GB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'mp4', 'mkv', 'avi', 'mov', 'flv', 'ts', 'webm'}
 app.config['STREAMS_CONFIG_FILE'] = '/streams/streams_config.json'
 app.config['RECORDINGS_FOLDER'] = '/recordings'
+app.config['CAMERAS_CONFIG_FILE'] = '/streams/cameras.json'
+app.config['CAMERA_PROBE_INTERVAL'] = float(os.getenv('CAMERA_PROBE_INTERVAL', '30'))  # Seconds between camera health checks
+# Colon-separated directories indexed (recursively) for the media list; defaults to UPLOAD_FOLDER
+app.config['MEDIA_LIBRARY_ROOTS'] = [root for root in os.getenv('MEDIA_LIBRARY_ROOTS', '').split(':') if root]
+app.config['BROWSE_CACHE_TTL'] = float(os.getenv('BROWSE_CACHE_TTL', '30'))  # Seconds a directory listing stays cached
+app.config['BROWSE_TIME_BUDGET'] = float(os.getenv('BROWSE_TIME_BUDGET', '2'))  # Seconds before returning a partial listing
+app.config['MAX_CONCURRENT_STARTS'] = int(os.getenv('MAX_CONCURRENT_STARTS', '8'))  # Admission limit for bulk starts
+app.config['ON_DEMAND_IDLE_TIMEOUT'] = float(os.getenv('ON_DEMAND_IDLE_TIMEOUT', '30'))  # Seconds without readers before stopping
+app.config['ON_DEMAND_CALLBACK_URL'] = os.getenv('ON_DEMAND_CALLBACK_URL', 'http://stream_manager:5000')  # Manager URL as seen by MediaMTX
+app.config['READY_SLO_SECONDS'] = float(os.getenv('READY_SLO_SECONDS', '5'))  # Start-to-ready target reported with the histograms
+app.config['READY_WAIT_TIMEOUT'] = float(os.getenv('READY_WAIT_TIMEOUT', '15'))  # Default wait of /api/streams/start with "wait": true
+# Clustered mode: shared state URL (e.g. sqlite:///streams/cluster.db); empty runs a standalone node
+app.config['CLUSTER_BACKEND'] = os.getenv('CLUSTER_BACKEND', '')
+app.config['CLUSTER_NODE_ID'] = os.getenv('CLUSTER_NODE_ID') or socket.gethostname()
+app.config['CLUSTER_NODE_URL'] = os.getenv('CLUSTER_NODE_URL') or f'http://{socket.gethostname()}:5000'  # How peers reach this API
+app.config['CLUSTER_NODE_CAPACITY'] = float(os.getenv('CLUSTER_NODE_CAPACITY', str(os.cpu_count() or 1)))  # Relative encoder capacity
+app.config['CLUSTER_HEARTBEAT_INTERVAL'] = float(os.getenv('CLUSTER_HEARTBEAT_INTERVAL', '5'))
+
+# Directory listings for the file browser
+file_browser = FileBrowser(app.config['ALLOWED_EXTENSIONS'], ttl=app.config['BROWSE_CACHE_TTL'],
+                           time_budget=app.config['BROWSE_TIME_BUDGET'])
+
+# Media file index, created on first use so UPLOAD_FOLDER overrides are honoured
+media_library = None
+media_library_lock = threading.Lock()
+
+# Camera health/parameter registry, created on first use
+camera_registry = None
+camera_registry_lock = threading.Lock()
+
+# This node's cluster membership, created on first use when CLUSTER_BACKEND is set
+cluster_node = None
+cluster_lock = threading.Lock()
+# Marks API requests another node already placed here, so they are not forwarded again
+CLUSTER_FORWARD_HEADER = 'X-Cluster-Forwarded-By'
 
 # Store active stream processes
 active_streams = {}
 stream_lock = threading.Lock()
+# Cached ffprobe frame rates keyed by file and mtime
+frame_rate_cache = {}
+# Shared file-source publishers keyed by source key (one encoder fanned out to many paths)
+shared_sources = {}
+# Serializes declarative applies so two reconciliations never interleave
+apply_lock = threading.Lock()
+# Names of streams being prepared/launched, so a name never runs twice (guarded by stream_lock)
+starting_names = set()
+# Idle-reader monitor for on-demand streams, started with the first one
+on_demand_monitor_started = False
+on_demand_lock = threading.Lock()
+ON_DEMAND_CHECK_INTERVAL = 5.0  # Seconds between reader checks
+ON_DEMAND_START_TIMEOUT = 20.0  # Seconds MediaMTX holds a reader while the publisher warms up
+# Readiness monitor: polls MediaMTX quickly while streams are coming up, slowly once all are ready
+readiness_monitor_started = False
+readiness_lock = threading.Lock()
+readiness_wakeup = threading.Event()
+READINESS_CHECK_INTERVAL = 0.25
+READINESS_IDLE_INTERVAL = 2.0
+MAX_READY_WAIT = 25.0  # Below the cluster forwarding timeout, so a forwarded start can wait too
+# Start-to-ready times by stream kind
+time_to_ready = {kind: Histogram() for kind in ('file', 'camera', 'shared', 'on_demand')}
+
+# Stream spec fields that require a restart when they change
+STREAM_SPEC_FIELDS = ('file', 'camera_url', 'protocol', 'bitrate', 'resolution', 'hw_accel',
+                      'audio_codec', 'enable_recording', 'auth_user', 'auth_pass', 'shared_source',
+                      'latency_profile', 'rate_control', 'quality', 'camera_mode', 'on_demand', 'idle_timeout',
+                      'filters')
 
 def get_server_ip():
     """Get the server's IP address"""
@@ -57,31 +134,80 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def get_media_files():
-    """Get list of media files in the streams directory"""
-    streams_path = Path(app.config['UPLOAD_FOLDER'])
-    if not streams_path.exists():
-        return []
+def get_media_library():
+    """Get the media library index, starting it on first use"""
+    global media_library
+    with media_library_lock:
+        if media_library is None:
+            roots = app.config['MEDIA_LIBRARY_ROOTS'] or [app.config['UPLOAD_FOLDER']]
+            media_library = MediaLibrary(roots, app.config['ALLOWED_EXTENSIONS'],
+                                         primary_root=app.config['UPLOAD_FOLDER'])
+            media_library.start()
+    return media_library
+
+def get_camera_registry():
+    """Get the camera registry, starting its probe schedule on first use"""
+    global camera_registry
+    with camera_registry_lock:
+        if camera_registry is None:
+            camera_registry = CameraRegistry(app.config['CAMERAS_CONFIG_FILE'],
+                                             interval=app.config['CAMERA_PROBE_INTERVAL'])
+            camera_registry.start()
+    return camera_registry
+
+def get_cluster_node():
+    """Get this node's cluster coordinator, joining the cluster on first use (None when standalone)"""
+    global cluster_node
+    if not app.config['CLUSTER_BACKEND']:
+        return None
+    with cluster_lock:
+        if cluster_node is None:
+            cluster_node = ClusterNode(open_cluster_store(app.config['CLUSTER_BACKEND']),
+                                       app.config['CLUSTER_NODE_ID'], app.config['CLUSTER_NODE_URL'],
+                                       app.config['CLUSTER_NODE_CAPACITY'], cluster_local_streams,
+                                       adopt_stream, stop_and_save_stream,
+                                       interval=app.config['CLUSTER_HEARTBEAT_INTERVAL'])
+            cluster_node.start()
+    return cluster_node
+
+def forward_to_node(node, method, path, payload=None):
+    """Proxy an API request to another cluster node and relay its response"""
+    try:
+        response = requests.request(method, f"{node['url']}{path}", json=payload, timeout=30,
+                                    headers={CLUSTER_FORWARD_HEADER: app.config['CLUSTER_NODE_ID']})
+        return response.content, response.status_code, {'Content-Type': 'application/json'}
+    except requests.RequestException as e:
+        return jsonify({'success': False, 'error': f"Node {node['node_id']} is unreachable: {e}"}), 503
 
-    media_files = []
-    for ext in app.config['ALLOWED_EXTENSIONS']:
-        media_files.extend(streams_path.glob(f'*.{ext}'))
+def request_node(node, method, path, payload=None, timeout=30):
+    """Call another cluster node's API as a forwarded request, so it acts on its local streams only
 
-    return [f.name for f in sorted(media_files)]
+    Returns:
+        (status code, JSON body). Raises requests.RequestException if the node cannot be reached.
+    """
+    response = requests.request(method, f"{node['url']}{path}", json=payload, timeout=timeout,
+                                headers={CLUSTER_FORWARD_HEADER: app.config['CLUSTER_NODE_ID']})
+    try:
+        return response.status_code, response.json()
+    except ValueError:
+        return response.status_code, {'success': False, 'error': response.text[:200]}
 
 def get_mediamtx_api_url():
     """Get MediaMTX API base URL"""
     mediamtx_host = os.getenv('MEDIAMTX_HOST', 'mediamtx')
-    return f'http://{mediamtx_host}:9997'
+    api_port = os.getenv('MEDIAMTX_API_PORT', '9997')
+    return f'http://{mediamtx_host}:{api_port}'
+
+def fetch_mediamtx_paths():
+    """Get all paths/streams from MediaMTX API, raising if MediaMTX cannot be asked"""
+    response = requests.get(f'{get_mediamtx_api_url()}/v3/paths/list', timeout=2)
+    response.raise_for_status()
+    return response.json().get('items', [])
 
 def get_mediamtx_paths():
-    """Get all paths/streams from MediaMTX API"""
+    """Get all paths/streams from MediaMTX API (empty list on errors)"""
     try:
-        response = requests.get(f'{get_mediamtx_api_url()}/v3/paths/list', timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('items', [])
-        return []
+        return fetch_mediamtx_paths()
     except Exception as e:
         print(f"Error fetching MediaMTX paths: {e}")
         return []
@@ -116,14 +242,18 @@ def calculate_bitrate(bytes_received, bytes_sent):
 
 def save_streams_config():
     """Save current stream configurations to JSON file for persistence"""
+    if app.config['CLUSTER_BACKEND']:
+        # The cluster store is the source of truth; nodes may share the /streams volume
+        return
+
     try:
         config_file = app.config['STREAMS_CONFIG_FILE']
         streams_to_save = []
 
         with stream_lock:
             for stream_id, stream_data in active_streams.items():
-                # Only save running streams
-                if stream_data['status'] == 'running':
+                # Only save live streams (including ones whose FFmpeg is still spawning or idle on demand)
+                if stream_data['status'] in ('starting', 'running', 'idle'):
                     config = {
                         'id': stream_id,
                         'name': stream_data['name'],
@@ -131,7 +261,17 @@ def save_streams_config():
                         'bitrate': stream_data.get('bitrate', '2M'),
                         'resolution': stream_data.get('resolution', 'Original'),
                         'source_type': stream_data.get('source_type', 'file'),
-                        'file': stream_data['file']
+                        'file': stream_data['file'],
+                        'hw_accel': stream_data.get('hw_accel'),
+                        'audio_codec': stream_data.get('audio_codec', 'opus'),
+                        'shared_source': bool(stream_data.get('shared_source')),
+                        'latency_profile': stream_data.get('latency_profile', DEFAULT_LATENCY_PROFILE),
+                        'rate_control': stream_data.get('rate_control', DEFAULT_RATE_CONTROL),
+                        'quality': stream_data.get('quality'),
+                        'camera_mode': stream_data.get('camera_mode', DEFAULT_CAMERA_MODE),
+                        'on_demand': stream_data['spec'].get('on_demand', False),
+                        'idle_timeout': stream_data['spec'].get('idle_timeout'),
+                        'filters': stream_data['spec'].get('filters') or []
                     }
                     streams_to_save.append(config)
 
@@ -161,69 +301,47 @@ def load_streams_config():
 
         for stream_config in saved_streams:
             try:
-                stream_id = stream_config.get('id', str(uuid.uuid4()))
                 stream_name = stream_config['name']
-                protocol = stream_config['protocol']
-                bitrate = stream_config.get('bitrate', '2M')
+                file_info = stream_config['file']
                 resolution = stream_config.get('resolution')
                 if resolution == 'Original':
                     resolution = None
-                source_type = stream_config.get('source_type', 'file')
-                file_info = stream_config['file']
+
+                spec = {
+                    'name': stream_name,
+                    'protocol': stream_config['protocol'],
+                    'bitrate': stream_config.get('bitrate', '2M'),
+                    'resolution': resolution,
+                    'hw_accel': stream_config.get('hw_accel'),
+                    'audio_codec': stream_config.get('audio_codec', 'opus'),
+                    'shared_source': stream_config.get('shared_source', False),
+                    'latency_profile': stream_config.get('latency_profile'),
+                    'rate_control': stream_config.get('rate_control'),
+                    'quality': stream_config.get('quality'),
+                    'camera_mode': stream_config.get('camera_mode'),
+                    'on_demand': stream_config.get('on_demand', False),
+                    'idle_timeout': stream_config.get('idle_timeout'),
+                    'filters': stream_config.get('filters') or []
+                }
+
+                # Configs saved before bitrate ranges existed may fall outside them; clamp instead of dropping the stream
+                bitrate, clamped = clamp_bitrate(spec['bitrate'], output_resolution(spec['filters']) or resolution)
+                if clamped:
+                    print(f"Stream {stream_name}: bitrate {spec['bitrate']} is outside the range for its resolution, using {bitrate}")
+                    spec['bitrate'] = bitrate
 
                 # Determine video source
-                is_camera = source_type == 'camera'
-                if is_camera:
+                if stream_config.get('source_type', 'file') == 'camera':
                     # Extract camera URL from file info
-                    if file_info.startswith('Camera: '):
-                        video_source = file_info.replace('Camera: ', '')
-                    else:
+                    if not file_info.startswith('Camera: '):
                         print(f"Skipping invalid camera config for stream {stream_name}")
                         continue
+                    spec['camera_url'] = file_info.replace('Camera: ', '')
                 else:
-                    # File source
-                    if os.path.isabs(file_info):
-                        video_source = file_info
-                    else:
-                        video_source = os.path.join(app.config['UPLOAD_FOLDER'], file_info)
-
-                    if not os.path.exists(video_source):
-                        print(f"Skipping stream {stream_name} - file not found: {video_source}")
-                        continue
+                    spec['file'] = file_info
 
-                # Build FFmpeg command (no hw_accel from saved config for now, default to opus audio)
-                command = build_ffmpeg_command(video_source, stream_name, protocol, bitrate, resolution, is_camera, None, None, None, 'opus')
-
-                # Generate all stream URLs
-                server_ip = get_server_ip()
-                rtsp_url = f'rtsp://{server_ip}:8554/{stream_name}'
-                rtmp_url = f'rtmp://{server_ip}:1935/{stream_name}'
-                srt_url = f'srt://{server_ip}:8890?streamid=read:{stream_name}'
-                webrtc_url = f'http://{server_ip}:8889/{stream_name}'
-                hls_url = f'http://{server_ip}:8888/{stream_name}/index.m3u8'
-
-                # Store stream info
-                with stream_lock:
-                    active_streams[stream_id] = {
-                        'name': stream_name,
-                        'protocol': protocol,
-                        'status': 'starting',
-                        'file': file_info,
-                        'source_type': source_type,
-                        'bitrate': bitrate,
-                        'resolution': resolution or 'Original',
-                        'rtsp_url': rtsp_url,
-                        'rtmp_url': rtmp_url,
-                        'srt_url': srt_url,
-                        'webrtc_url': webrtc_url,
-                        'hls_url': hls_url,
-                        'process': None
-                    }
-
-                # Start stream in background thread
-                thread = threading.Thread(target=start_stream_process, args=(stream_id, command))
-                thread.daemon = True
-                thread.start()
+                stream_id, stream_entry, command = prepare_stream(normalize_stream_spec(spec))
+                launch_stream(stream_config.get('id', stream_id), stream_entry, command)
 
                 print(f"Auto-started stream: {stream_name}")
 
@@ -233,11 +351,46 @@ def load_streams_config():
     except Exception as e:
         print(f"Error loading stream configurations: {e}")
 
-def build_ffmpeg_command(video_source, stream_name, protocol, bitrate='2M', resolution=None, is_camera=False, hw_accel=None, auth_user=None, auth_pass=None, audio_codec='opus'):
+def probe_frame_rate(video_source):
+    """Probe a file's video frame rate with ffprobe, cached per file and mtime. Returns None if unknown."""
+    try:
+        cache_key = (video_source, os.path.getmtime(video_source))
+    except OSError:
+        return None
+
+    if cache_key in frame_rate_cache:
+        return frame_rate_cache[cache_key]
+
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'stream=avg_frame_rate,r_frame_rate', '-of', 'json', video_source]
+
+    frame_rate = None
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=10)
+        streams = json.loads(result.stdout or b'{}').get('streams', [])
+        if streams:
+            # avg_frame_rate is 0/0 for some live sources, fall back to r_frame_rate
+            for field in ('avg_frame_rate', 'r_frame_rate'):
+                num, _, den = streams[0].get(field, '0/0').partition('/')
+                if den and float(den) > 0 and float(num) > 0:
+                    frame_rate = float(num) / float(den)
+                    break
+    except Exception as e:
+        print(f"Error probing frame rate for {video_source}: {e}")
+
+    frame_rate_cache[cache_key] = frame_rate
+    return frame_rate
+
+def build_ffmpeg_command(video_source, stream_name, protocol, bitrate='2M', resolution=None, is_camera=False, hw_accel=None, auth_user=None, auth_pass=None, audio_codec='opus', latency_profile=None, rate_control=None, quality=None,
+                         input_opts=None, filters=None):
     """Build FFmpeg command based on protocol and settings with optional hardware acceleration and authentication
 
     Args:
         audio_codec: Audio codec to use ('opus' or 'aac'). Default is 'opus' for WebRTC compatibility.
+        latency_profile: Settings from resolve_latency_profile(); defaults to the balanced profile at 30 fps.
+        rate_control: 'cbr' (default) or 'capped-crf', with quality as the CRF/CQ value.
+        input_opts: Extra input options for camera sources (e.g. probe hints from the camera registry).
+        filters: Steps from validate_filters(); compiled together with resolution into one filter graph.
     """
     mediamtx_host = os.getenv('MEDIAMTX_HOST', 'mediamtx')
 
@@ -250,78 +403,53 @@ def build_ffmpeg_command(video_source, stream_name, protocol, bitrate='2M', reso
     elif hw_accel == 'nvenc':
         hw_input_opts = ['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda']
 
+    # Machine-readable progress on stdout drives stream readiness; no interactive stats on stderr
+    progress_opts = ['-nostats', '-progress', 'pipe:1']
+
     if is_camera:
         # Camera input - no loop, use TCP for RTSP cameras
-        base_cmd = ['ffmpeg'] + hw_input_opts + [
+        base_cmd = ['ffmpeg'] + progress_opts + hw_input_opts + (input_opts or []) + [
             '-rtsp_transport', 'tcp',
             '-i', video_source
         ]
     else:
         # File input - loop indefinitely
-        base_cmd = ['ffmpeg'] + hw_input_opts + [
+        base_cmd = ['ffmpeg'] + progress_opts + hw_input_opts + [
             '-re',
             '-stream_loop', '-1',
             '-i', video_source
         ]
 
+    # GOP, B-frames, lookahead and VBV size come from the latency profile
+    if latency_profile is None:
+        latency_profile = resolve_latency_profile(DEFAULT_LATENCY_PROFILE)
+
     # Video encoding settings based on hardware acceleration
     if hw_accel == 'nvenc':
         # NVIDIA NVENC encoder
         video_opts = [
             '-c:v', 'h264_nvenc',
-            '-preset', 'p4',  # NVENC preset (p1-p7)
-            '-tune', 'll',    # Low latency
-            '-b:v', bitrate,
-            '-maxrate', bitrate,
-            '-bufsize', f'{int(bitrate.rstrip("M")) * 2}M',
-            '-g', '60',
-            '-rc', 'cbr',
-            '-rc-lookahead', '20'
+            '-preset', 'p4'  # NVENC preset (p1-p7)
         ]
     elif hw_accel == 'qsv':
         # Intel QuickSync encoder
         video_opts = [
             '-c:v', 'h264_qsv',
-            '-preset', 'veryfast',
-            '-b:v', bitrate,
-            '-maxrate', bitrate,
-            '-bufsize', f'{int(bitrate.rstrip("M")) * 2}M',
-            '-g', '60',
-            '-look_ahead', '1'
+            '-preset', 'veryfast'
         ]
     elif hw_accel == 'vaapi':
         # VA-API encoder
-        video_opts = [
-            '-c:v', 'h264_vaapi',
-            '-b:v', bitrate,
-            '-maxrate', bitrate,
-            '-bufsize', f'{int(bitrate.rstrip("M")) * 2}M',
-            '-g', '60'
-        ]
+        video_opts = ['-c:v', 'h264_vaapi']
     else:
         # Software encoder (libx264)
-        video_opts = [
-            '-c:v', 'libx264',
-            '-preset', 'veryfast',
-            '-tune', 'zerolatency',
-            '-b:v', bitrate,
-            '-maxrate', bitrate,
-            '-bufsize', f'{int(bitrate.rstrip("M")) * 2}M',
-            '-g', '60',
-            '-keyint_min', '60',
-            '-sc_threshold', '0'
-        ]
+        video_opts = ['-c:v', 'libx264']
+    video_opts.extend(rate_control_opts(bitrate, hw_accel, rate_control, quality, latency_profile['bufsize_seconds']))
+    video_opts.extend(latency_video_opts(latency_profile, hw_accel))
 
-    # Add resolution scaling if specified
-    if resolution:
-        if hw_accel == 'vaapi':
-            video_opts.extend(['-vf', f'scale_vaapi=w={resolution.split(":")[0]}:h={resolution.split(":")[1]}'])
-        elif hw_accel == 'qsv':
-            video_opts.extend(['-vf', f'scale_qsv=w={resolution.split(":")[0]}:h={resolution.split(":")[1]}'])
-        elif hw_accel == 'nvenc':
-            video_opts.extend(['-vf', f'scale_cuda={resolution}'])
-        else:
-            video_opts.extend(['-vf', f'scale={resolution}'])
+    # Filters and resolution scaling run as one graph in the encoder family's filters (GPU frames stay on the GPU)
+    filter_graph = compile_filter_graph(filters, resolution, hw_accel)
+    base_cmd.extend(filter_graph['inputs'])
+    video_opts.extend(filter_graph['options'])
 
     # Audio encoding based on selected codec
     # Opus: Required for WebRTC, modern codec with excellent quality
@@ -369,31 +497,54 @@ def build_ffmpeg_command(video_source, stream_name, protocol, bitrate='2M', reso
     return base_cmd + video_opts + audio_opts + output
 
 def start_stream_process(stream_id, command):
-    """Start FFmpeg process for streaming"""
+    """Start FFmpeg process for streaming
+
+    The stream stays 'starting' until the readiness monitor sees its MediaMTX path ready.
+    """
+    readiness = None
     try:
         # Log the command being executed
         print(f"Starting stream {stream_id} with command: {' '.join(command)}")
 
+        with stream_lock:
+            readiness = active_streams[stream_id]['readiness']
+
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             preexec_fn=os.setsid if os.name != 'nt' else None
         )
+        readers = follow_process(process, readiness)
 
         with stream_lock:
-            active_streams[stream_id]['process'] = process
-            active_streams[stream_id]['status'] = 'running'
+            if stream_id in active_streams and active_streams[stream_id]['readiness'] is readiness:
+                active_streams[stream_id]['process'] = process
+            else:
+                # Stopped while we were spawning
+                terminate_stream_process(process)
 
         # Wait for process to complete or be terminated
         process.wait()
+        for reader in readers:
+            reader.join(timeout=2)
 
         with stream_lock:
-            if stream_id in active_streams:
-                if process.returncode != 0:
-                    stderr = process.stderr.read().decode('utf-8', errors='ignore')
+            if stream_id in active_streams and active_streams[stream_id]['readiness'] is readiness:
+                deactivating = active_streams[stream_id].pop('deactivating', False)
+                if deactivating or active_streams[stream_id].get('on_demand'):
+                    # On-demand stream stopped for lack of readers (by us, or by MediaMTX's
+                    # runOnDemandCloseAfter, which kills FFmpeg with a non-zero exit); the next
+                    # reader starts it again. A run that never got ready keeps its error.
+                    active_streams[stream_id]['status'] = 'idle'
+                    active_streams[stream_id]['process'] = None
+                    if process.returncode != 0 and not deactivating and readiness.time_to_ready is None:
+                        active_streams[stream_id]['error'] = readiness.error_tail()
+                    print(f"Stream {stream_id} is idle")
+                elif process.returncode != 0:
+                    stderr = readiness.error_tail()
                     active_streams[stream_id]['status'] = 'failed'
-                    active_streams[stream_id]['error'] = stderr[-1000:]  # Last 1000 chars
+                    active_streams[stream_id]['error'] = stderr  # Last 1000 chars
                     print(f"Stream {stream_id} failed with error: {stderr[-500:]}")
                 else:
                     active_streams[stream_id]['status'] = 'stopped'
@@ -406,23 +557,832 @@ def start_stream_process(stream_id, command):
                 active_streams[stream_id]['status'] = 'failed'
                 active_streams[stream_id]['error'] = str(e)
 
+    # Only after the final status is set, so waiters on readiness see it
+    if readiness:
+        readiness.close()
+
+def shared_source_key(video_source, spec):
+    """Key identifying a shared publisher: same file and same encoding settings"""
+    material = json.dumps([os.path.realpath(video_source), spec['bitrate'], spec['resolution'], spec['hw_accel'],
+                           spec['audio_codec'], spec['latency_profile'], spec['rate_control'], spec['quality'],
+                           spec['filters']])
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()[:12]
+
+def shared_source_path(key):
+    """MediaMTX path the shared publisher for a key pushes to"""
+    return f'shared_{key}'
+
+def configure_mediamtx_path(path_name, path_config):
+    """Add a path to the MediaMTX configuration, updating it if it already exists. Returns True on success."""
+    try:
+        api_url = get_mediamtx_api_url()
+        response = requests.post(f'{api_url}/v3/config/paths/add/{path_name}', json=path_config, timeout=5)
+        if response.status_code != 200:
+            # Path already configured (e.g. left over from a previous run) - update it in place
+            response = requests.patch(f'{api_url}/v3/config/paths/patch/{path_name}', json=path_config, timeout=5)
+        return response.status_code == 200
+    except Exception as e:
+        print(f"Error configuring MediaMTX path {path_name}: {e}")
+        return False
+
+def add_mediamtx_source_path(path_name, source_path, enable_recording=False):
+    """Configure a MediaMTX path that pulls from another MediaMTX path instead of a publisher"""
+    path_config = {'source': f'rtsp://localhost:8554/{source_path}'}
+    if enable_recording:
+        path_config['record'] = True
+        path_config['recordPath'] = f'/recordings/{path_name}/%Y-%m-%d_%H-%M-%S-%f'
+    return configure_mediamtx_path(path_name, path_config)
+
+def add_mediamtx_camera_path(path_name, camera_url, enable_recording=False):
+    """Configure a MediaMTX path that pulls a camera directly, connecting only while it has readers"""
+    path_config = {
+        'source': camera_url,
+        # Recording needs the camera connected all the time
+        'sourceOnDemand': not enable_recording
+    }
+    if camera_url.startswith('rtsp'):
+        path_config['rtspTransport'] = 'tcp'
+    if enable_recording:
+        path_config['record'] = True
+        path_config['recordPath'] = f'/recordings/{path_name}/%Y-%m-%d_%H-%M-%S-%f'
+    return configure_mediamtx_path(path_name, path_config)
+
+def attach_camera_path(stream_id, stream_entry):
+    """Register a pull-mode camera stream; MediaMTX does the ingest, so there is no FFmpeg process"""
+    with stream_lock:
+        active_streams[stream_id] = stream_entry
+
+    configured = add_mediamtx_camera_path(stream_entry['name'], stream_entry['spec']['camera_url'],
+                                          stream_entry['spec']['enable_recording'])
+
+    with stream_lock:
+        if stream_id in active_streams:
+            if configured:
+                active_streams[stream_id]['status'] = 'running'
+            else:
+                active_streams[stream_id]['status'] = 'failed'
+                active_streams[stream_id]['error'] = 'Could not configure MediaMTX path for camera'
+
+def add_mediamtx_on_demand_path(path_name, idle_timeout, enable_recording=False):
+    """Configure a MediaMTX path whose first reader calls back into the manager to start the publisher"""
+    callback_url = f"{app.config['ON_DEMAND_CALLBACK_URL']}/api/streams/demand/{quote(path_name)}"
+    path_config = {
+        # The hook only triggers the start; MediaMTX holds the reader until FFmpeg publishes
+        'runOnDemand': f'wget -q -O /dev/null --post-data= {callback_url}',
+        'runOnDemandStartTimeout': f'{ON_DEMAND_START_TIMEOUT:g}s',
+        # MediaMTX would close the publisher after 10s without readers; leave idle stops to
+        # the manager's check, with MediaMTX only as a backstop one check interval later
+        'runOnDemandCloseAfter': f'{idle_timeout + ON_DEMAND_CHECK_INTERVAL:g}s',
+        'runOnDemandRestart': False
+    }
+    if enable_recording:
+        path_config['record'] = True
+        path_config['recordPath'] = f'/recordings/{path_name}/%Y-%m-%d_%H-%M-%S-%f'
+    return configure_mediamtx_path(path_name, path_config)
+
+def register_on_demand_stream(stream_id, stream_entry, command):
+    """Register an on-demand stream as idle; its FFmpeg starts when the first reader arrives"""
+    stream_entry['status'] = 'idle'
+    stream_entry['command'] = command
+    with stream_lock:
+        active_streams[stream_id] = stream_entry
+
+    start_on_demand_monitor()
+    configured = add_mediamtx_on_demand_path(stream_entry['name'], stream_entry['demand']['idle_timeout'],
+                                             stream_entry['spec']['enable_recording'])
+
+    if not configured:
+        with stream_lock:
+            if stream_id in active_streams:
+                active_streams[stream_id]['status'] = 'failed'
+                active_streams[stream_id]['error'] = 'Could not configure MediaMTX on-demand path'
+
+def activate_stream(stream_id):
+    """Start the FFmpeg of an idle on-demand stream. Returns False if it is not an on-demand stream."""
+    with stream_lock:
+        stream_entry = active_streams.get(stream_id)
+        if stream_entry is None or not stream_entry.get('on_demand'):
+            return False
+        if stream_entry['status'] in ('starting', 'running'):
+            return True
+
+        stream_entry['status'] = 'starting'
+        stream_entry['error'] = None
+        stream_entry['process'] = None
+        # Time to ready from here is the warm-up a waiting reader sees
+        stream_entry['readiness'] = StreamReadiness()
+        demand = stream_entry['demand']
+        demand['activations'] += 1
+        demand['last_active'] = time.time()
+        command = stream_entry['command']
+
+    print(f"Activating on-demand stream {stream_entry['name']}")
+
+    thread = threading.Thread(target=start_stream_process, args=(stream_id, command))
+    thread.daemon = True
+    thread.start()
+
+    start_readiness_monitor()
+    return True
+
+def check_idle_streams():
+    """Stop the FFmpeg of on-demand streams that have had no readers for their idle timeout"""
+    with stream_lock:
+        candidates = [(stream_id, stream_data) for stream_id, stream_data in active_streams.items()
+                      if stream_data.get('on_demand') and stream_data['status'] in ('starting', 'running')]
+    if not candidates:
+        return
+
+    readers = {path_item.get('name'): len(path_item.get('readers', [])) for path_item in get_mediamtx_paths()}
+    now = time.time()
+
+    for stream_id, stream_data in candidates:
+        name = stream_data['name']
+        with stream_lock:
+            # A path missing from the list means MediaMTX could not be asked - never count that as idle
+            if active_streams.get(stream_id) is not stream_data or name not in readers:
+                continue
+            demand = stream_data['demand']
+            if readers[name] > 0:
+                demand['last_active'] = now
+                continue
+            if now - demand['last_active'] < demand['idle_timeout']:
+                continue
+            stream_data['deactivating'] = True
+            process = stream_data['process']
+
+        print(f"Stream {name} has had no readers for {demand['idle_timeout']:g}s, stopping FFmpeg")
+        terminate_stream_process(process)
+
+def on_demand_monitor():
+    while True:
+        time.sleep(ON_DEMAND_CHECK_INTERVAL)
+        try:
+            check_idle_streams()
+        except Exception as e:
+            print(f"Error checking on-demand streams: {e}")
+
+def start_on_demand_monitor():
+    """Start the idle-reader monitor (idempotent)"""
+    global on_demand_monitor_started
+    with on_demand_lock:
+        if on_demand_monitor_started:
+            return
+        on_demand_monitor_started = True
+
+    thread = threading.Thread(target=on_demand_monitor, name='on-demand-monitor', daemon=True)
+    thread.start()
+
+def on_demand_stats(stream_data):
+    """Activation and warm-up figures for an on-demand stream (None for always-on streams)"""
+    if not stream_data.get('on_demand'):
+        return None
+    demand = stream_data['demand']
+    warmups = demand['warmups']
+    return {
+        'idle_timeout': demand['idle_timeout'],
+        'activations': demand['activations'],
+        'last_active': demand['last_active'],
+        'last_warmup_seconds': warmups[-1] if warmups else None,
+        'avg_warmup_seconds': round(sum(warmups) / len(warmups), 3) if warmups else None,
+        'max_warmup_seconds': max(warmups) if warmups else None
+    }
+
+def record_ready(stream_id, stream_data, readiness):
+    """Mark a stream live once MediaMTX serves its path and record its time to ready"""
+    with stream_lock:
+        if active_streams.get(stream_id) is not stream_data or stream_data.get('readiness') is not readiness:
+            return
+        if stream_data['status'] == 'starting':
+            stream_data['status'] = 'running'
+        if stream_data.get('on_demand'):
+            warmups = stream_data['demand']['warmups']
+            warmups.append(readiness.time_to_ready)
+            del warmups[:-20]
+
+    if stream_data.get('on_demand'):
+        kind = 'on_demand'
+    elif stream_data.get('shared_source'):
+        kind = 'shared'
+    else:
+        kind = stream_data['source_type']
+    time_to_ready[kind].observe(readiness.time_to_ready)
+    print(f"Stream {stream_data['name']} ready {readiness.time_to_ready}s after start")
+
+def check_stream_readiness():
+    """Update the readiness of starting and running streams from one MediaMTX path listing
+
+    Returns:
+        True while some stream is not ready yet (the monitor then polls quickly).
+    """
+    with stream_lock:
+        tracked = [(stream_id, stream_data, stream_data['readiness']) for stream_id, stream_data in active_streams.items()
+                   if stream_data.get('readiness') and stream_data['status'] in ('starting', 'running')]
+    if not tracked:
+        return False
+
+    try:
+        paths = {path_item.get('name'): (path_item.get('ready', False), parse_ready_time(path_item.get('readyTime')))
+                 for path_item in fetch_mediamtx_paths()}
+    except Exception as e:
+        # Unknown is not "not ready": leave every stream's state alone until MediaMTX answers
+        print(f"Error checking stream readiness: {e}")
+        return False
+
+    pending = False
+    for stream_id, stream_data, readiness in tracked:
+        if readiness.update(*paths.get(stream_data['name'], (False, None))):
+            record_ready(stream_id, stream_data, readiness)
+        pending = pending or readiness.state not in ('ready', 'degraded')
+    return pending
+
+def readiness_monitor():
+    while True:
+        pending = False
+        try:
+            pending = check_stream_readiness()
+        except Exception as e:
+            print(f"Error in readiness monitor: {e}")
+        readiness_wakeup.wait(READINESS_CHECK_INTERVAL if pending else READINESS_IDLE_INTERVAL)
+        readiness_wakeup.clear()
+
+def start_readiness_monitor():
+    """Start the readiness monitor (idempotent) and make it check new streams right away"""
+    global readiness_monitor_started
+    with readiness_lock:
+        if not readiness_monitor_started:
+            readiness_monitor_started = True
+            thread = threading.Thread(target=readiness_monitor, name='readiness-monitor', daemon=True)
+            thread.start()
+    readiness_wakeup.set()
+
+def ready_wait_timeout(wait):
+    """Seconds /api/streams/start waits for the stream to be live ("wait": true or seconds), None to return at once"""
+    if wait is None or wait is False:
+        return None
+    if wait is True:
+        return app.config['READY_WAIT_TIMEOUT']
+    try:
+        seconds = float(wait)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid wait: {wait!r}')
+    if not 0 < seconds <= MAX_READY_WAIT:
+        raise ValueError(f'wait must be between 0 and {MAX_READY_WAIT:g} seconds')
+    return seconds
+
+def remove_mediamtx_path(path_name):
+    """Remove a path from the MediaMTX configuration"""
+    try:
+        requests.delete(f'{get_mediamtx_api_url()}/v3/config/paths/delete/{path_name}', timeout=5)
+    except Exception as e:
+        print(f"Error removing MediaMTX path {path_name}: {e}")
+
+def start_shared_source_process(key, source, command):
+    """Run the FFmpeg publisher for a shared file source and fan its state out to its streams"""
+    try:
+        print(f"Starting shared source {key} with command: {' '.join(command)}")
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid if os.name != 'nt' else None
+        )
+        # The streams' readiness comes from their alias paths; this only keeps the pipes drained
+        output = StreamReadiness()
+        readers = follow_process(process, output)
+
+        with stream_lock:
+            source['process'] = process
+            source['status'] = 'running'
+            if shared_sources.get(key) is not source:
+                # Every stream detached while we were spawning
+                terminate_stream_process(process)
+
+        process.wait()
+        for reader in readers:
+            reader.join(timeout=2)
+        error = output.error_tail() if process.returncode != 0 else None
+
+    except Exception as e:
+        print(f"Exception starting shared source {key}: {str(e)}")
+        error = str(e)
+
+    with stream_lock:
+        if shared_sources.get(key) is not source:
+            return
+
+        source['status'] = 'failed' if error else 'stopped'
+        for stream_id in source['refs']:
+            if stream_id in active_streams:
+                active_streams[stream_id]['status'] = source['status']
+                active_streams[stream_id]['error'] = error
+                # Wake start requests waiting for these aliases to become ready
+                if active_streams[stream_id].get('readiness'):
+                    active_streams[stream_id]['readiness'].close()
+        print(f"Shared source {key} exited ({source['status']})")
+
+def attach_shared_source(stream_id, stream_entry, command):
+    """Register a stream as an alias of its shared publisher, spawning the publisher if needed"""
+    key = stream_entry['shared_source']
+    # The alias path is ready once MediaMTX pulls from a publishing shared source
+    stream_entry['readiness'] = StreamReadiness('connecting', tracks_progress=False)
+
+    with stream_lock:
+        active_streams[stream_id] = stream_entry
+        source = shared_sources.get(key)
+        spawn = source is None or source['status'] in ('failed', 'stopped')
+        if spawn:
+            source = {
+                'path': shared_source_path(key),
+                'file': stream_entry['file'],
+                'status': 'starting',
+                'process': None,
+                'refs': source['refs'] if source else set()
+            }
+            shared_sources[key] = source
+            # Aliases left behind by the exited publisher are served again once it publishes
+            for ref_id in source['refs']:
+                if ref_id in active_streams:
+                    active_streams[ref_id]['status'] = 'starting'
+                    active_streams[ref_id]['error'] = None
+                    active_streams[ref_id]['readiness'] = StreamReadiness('connecting', tracks_progress=False)
+        source['refs'].add(stream_id)
+
+    if spawn:
+        thread = threading.Thread(target=start_shared_source_process, args=(key, source, command))
+        thread.daemon = True
+        thread.start()
+
+    configured = add_mediamtx_source_path(stream_entry['name'], source['path'], stream_entry['spec']['enable_recording'])
+
+    if not configured:
+        with stream_lock:
+            if stream_id in active_streams:
+                active_streams[stream_id]['status'] = 'failed'
+                active_streams[stream_id]['error'] = 'Could not configure MediaMTX path for shared source'
+        stream_entry['readiness'].close()
+    start_readiness_monitor()
+
+def detach_shared_source(stream_id, stream_data):
+    """Remove a stream's alias path and stop the shared publisher once nothing references it"""
+    key = stream_data['shared_source']
+    remove_mediamtx_path(stream_data['name'])
+
+    with stream_lock:
+        source = shared_sources.get(key)
+        if source is None:
+            return
+        source['refs'].discard(stream_id)
+        if source['refs']:
+            return
+        del shared_sources[key]
+        terminate_stream_process(source['process'])
+
+def terminate_stream_process(process):
+    """Send SIGTERM to an FFmpeg process group. Returns True if it was still running."""
+    if not process or process.poll() is not None:
+        return False
+
+    if os.name != 'nt':
+        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+    else:
+        process.terminate()
+    return True
+
+def normalize_stream_spec(data):
+    """Normalize a stream start request into a comparable spec dict"""
+    return {
+        'name': data.get('name'),
+        'file': data.get('file') or None,
+        'camera_url': data.get('camera_url') or None,
+        'protocol': data.get('protocol', 'rtsp'),
+        'bitrate': data.get('bitrate', '2M'),
+        'resolution': data.get('resolution') or None,
+        'hw_accel': data.get('hw_accel') or None,  # Hardware acceleration: nvenc, qsv, vaapi, or None
+        'audio_codec': data.get('audio_codec') or 'opus',  # Audio codec: opus (default) or aac
+        'enable_recording': bool(data.get('enable_recording', False)),
+        'auth_user': data.get('auth_user') or None,  # Optional authentication username
+        'auth_pass': data.get('auth_pass') or None,  # Optional authentication password
+        'shared_source': bool(data.get('shared_source', False)),  # Reuse one encoder per file + settings
+        'latency_profile': data.get('latency_profile') or DEFAULT_LATENCY_PROFILE,  # ultra-low, low, balanced, quality
+        'rate_control': data.get('rate_control') or DEFAULT_RATE_CONTROL,  # cbr or capped-crf
+        'quality': data.get('quality'),  # CRF/CQ value for capped-crf, encoder default if omitted
+        'camera_mode': data.get('camera_mode') or DEFAULT_CAMERA_MODE,  # transcode or pull (cameras only)
+        'on_demand': bool(data.get('on_demand', False)),  # Start FFmpeg only while the stream has readers
+        'idle_timeout': data.get('idle_timeout'),  # Seconds without readers before an on-demand stream stops
+        'filters': data.get('filters') or []  # Filter steps: deinterlace, fps, scale, overlay
+    }
+
+def configure_recording(stream_name):
+    """Enable recording for a path through the MediaMTX config API"""
+    try:
+        mediamtx_api = f'{get_mediamtx_api_url()}/v3/config/paths/patch/{stream_name}'
+        recording_config = {
+            'record': True,
+            'recordPath': f'/recordings/{stream_name}/%Y-%m-%d_%H-%M-%S-%f'
+        }
+        requests.patch(mediamtx_api, json=recording_config, timeout=5)
+    except Exception as e:
+        print(f"Warning: Could not configure recording in MediaMTX: {e}")
+
+def prepare_stream(spec):
+    """Validate a normalized stream spec and build its FFmpeg command and tracking entry
+
+    Returns:
+        (stream_id, stream_entry, command); command is None for pull-mode cameras that
+        MediaMTX ingests directly. Raises ValueError for invalid specs,
+        FileNotFoundError when a file source does not exist and CameraUnreachableError
+        when the camera registry's last probe found the camera down. Nothing is changed
+        in MediaMTX or the camera registry until launch_stream.
+    """
+    stream_name = spec['name']
+    video_file = spec['file']
+    camera_url = spec['camera_url']
+    auth_user = spec['auth_user']
+    auth_pass = spec['auth_pass']
+
+    if not stream_name:
+        raise ValueError('Stream name is required')
+
+    # Determine source type
+    is_camera = False
+    if camera_url:
+        # IP Camera source
+        video_source = camera_url
+        is_camera = True
+        source_type = 'camera'
+    elif video_file:
+        # File source - handle both relative filenames and absolute paths
+        if os.path.isabs(video_file):
+            # Absolute path from file browser
+            video_source = video_file
+        else:
+            # Relative filename from dropdown
+            video_source = os.path.join(app.config['UPLOAD_FOLDER'], video_file)
+
+        if not os.path.exists(video_source):
+            raise FileNotFoundError('Video file not found')
+        source_type = 'file'
+    else:
+        raise ValueError('Either file or camera_url is required')
+
+    # Overlay images are named like media files: relative to the upload folder or absolute
+    filters = validate_filters(spec['filters'],
+                               lambda image: os.path.join(app.config['UPLOAD_FOLDER'], image))
+
+    # Validate bitrate units/range for the output resolution before anything is spawned
+    bitrate_bps, rate_mode, quality = validate_rate_control(spec['bitrate'],
+                                                            output_resolution(filters) or spec['resolution'],
+                                                            spec['rate_control'], spec['quality'])
+    bitrate = format_bitrate(bitrate_bps)
+
+    if spec['camera_mode'] not in CAMERA_MODES:
+        raise ValueError(f"Unknown camera mode: {spec['camera_mode']} (use {' or '.join(CAMERA_MODES)})")
+
+    idle_timeout = app.config['ON_DEMAND_IDLE_TIMEOUT']
+    if spec['on_demand']:
+        if spec['shared_source']:
+            raise ValueError('Shared file sources cannot be on-demand')
+        if spec['idle_timeout'] is not None:
+            try:
+                idle_timeout = float(spec['idle_timeout'])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid idle timeout: {spec['idle_timeout']!r}")
+            if idle_timeout <= 0:
+                raise ValueError('Idle timeout must be positive')
+
+    input_opts = None
+    ingest = 'transcode'
+    ingest_reason = None
+    if is_camera:
+        # Fail fast on cameras the registry knows are down, and reuse their cached stream parameters.
+        # New cameras are registered by launch_stream, so a rejected start leaves no trace.
+        registry = get_camera_registry()
+        registry.check_reachable(camera_url)
+        input_opts = registry.input_options(camera_url)
+        frame_rate = registry.frame_rate(camera_url)
+
+        if spec['camera_mode'] == 'pull':
+            # Let MediaMTX pull the camera unless its codecs don't fit the requested output
+            blockers = registry.passthrough_blockers(camera_url, spec['resolution'], spec['audio_codec'])
+            if filters:
+                blockers.append('video filters requested')
+            if blockers:
+                ingest_reason = 'Transcoding: ' + '; '.join(blockers)
+            else:
+                ingest = 'pull'
+    else:
+        frame_rate = probe_frame_rate(video_source)
+
+    # Derive GOP/lookahead/VBV from the probed frame rate so keyframes land on HLS segment boundaries
+    # An fps filter fixes the output rate, so the GOP follows it rather than the source
+    latency = resolve_latency_profile(spec['latency_profile'], output_frame_rate(filters) or frame_rate)
+
+    shared_key = None
+    if ingest == 'pull':
+        # The camera's own GOP and bitrate reach the readers unchanged
+        command = None
+        latency['gop'] = None
+    elif spec['shared_source'] and not is_camera:
+        if auth_user or auth_pass:
+            raise ValueError('Shared file sources do not support stream authentication')
+
+        # One publisher per file + encoding settings; this stream becomes a MediaMTX alias of it
+        shared_key = shared_source_key(video_source, spec)
+        command = build_ffmpeg_command(video_source, shared_source_path(shared_key), 'rtsp', bitrate,
+                                       spec['resolution'], False, spec['hw_accel'], None, None, spec['audio_codec'],
+                                       latency, rate_mode, quality, filters=filters)
+    else:
+        # Build FFmpeg command
+        command = build_ffmpeg_command(video_source, stream_name, spec['protocol'], bitrate, spec['resolution'],
+                                       is_camera, spec['hw_accel'], auth_user, auth_pass, spec['audio_codec'],
+                                       latency, rate_mode, quality, input_opts, filters)
+
+    # Generate all stream URLs (MediaMTX provides all protocols from single input)
+    server_ip = get_server_ip()
+
+    # Add authentication to URLs if provided
+    if auth_user and auth_pass:
+        auth_prefix = f'{auth_user}:{auth_pass}@'
+        rtsp_url = f'rtsp://{auth_prefix}{server_ip}:8554/{stream_name}'
+        rtmp_url = f'rtmp://{auth_prefix}{server_ip}:1935/{stream_name}'
+    else:
+        rtsp_url = f'rtsp://{server_ip}:8554/{stream_name}'
+        rtmp_url = f'rtmp://{server_ip}:1935/{stream_name}'
+
+    stream_entry = {
+        'name': stream_name,
+        'protocol': spec['protocol'],
+        'status': 'starting',
+        'file': video_file if not is_camera else f'Camera: {camera_url}',
+        'source_type': source_type,
+        'bitrate': bitrate,
+        'rate_control': rate_mode,
+        'quality': quality,
+        'resolution': spec['resolution'] or 'Original',
+        'hw_accel': spec['hw_accel'],
+        'audio_codec': spec['audio_codec'],
+        'filters': filters,
+        'latency_profile': latency['name'],
+        'latency': {
+            'frame_rate': latency['frame_rate'],
+            'gop': latency['gop'],
+            'expected': latency['expected_latency']
+        },
+        'rtsp_url': rtsp_url,
+        'rtmp_url': rtmp_url,
+        'srt_url': f'srt://{server_ip}:8890?streamid=read:{stream_name}',
+        'webrtc_url': f'http://{server_ip}:8889/{stream_name}',
+        'hls_url': f'http://{server_ip}:8888/{stream_name}/index.m3u8',
+        'shared_source': shared_key,
+        'camera_mode': spec['camera_mode'],
+        'ingest': ingest,
+        'ingest_reason': ingest_reason,
+        # Pulled cameras are already on demand through MediaMTX sourceOnDemand
+        'on_demand': spec['on_demand'] and ingest != 'pull',
+        'demand': {'idle_timeout': idle_timeout, 'activations': 0, 'last_active': None, 'warmups': []},
+        'readiness': None,  # Set per publisher run; pulled and idle streams have none
+        'spec': spec,
+        'process': None
+    }
+
+    return str(uuid.uuid4()), stream_entry, command
+
+def reserve_stream_names(names, replacing=()):
+    """Claim stream names for starts in progress
+
+    Args:
+        names: Names that must not be active or starting yet.
+        replacing: Names of active streams that the caller is about to restart.
+
+    Returns:
+        List of names already taken; nothing is reserved unless it is empty.
+    """
+    with stream_lock:
+        active_names = {stream_data['name'] for stream_data in active_streams.values()}
+        taken = [name for name in names if name in active_names or name in starting_names]
+        taken += [name for name in replacing if name in starting_names]
+        if not taken:
+            starting_names.update(names)
+            starting_names.update(replacing)
+        return taken
+
+def release_stream_names(names):
+    with stream_lock:
+        starting_names.difference_update(names)
+
+def launch_stream(stream_id, stream_entry, command):
+    """Register a prepared stream and start its FFmpeg process in a background thread
+
+    In clustered mode the name is claimed in the cluster store first, so a concurrent
+    start of the same name on another node raises StreamAssignedError before anything runs.
+    """
+    cluster = get_cluster_node()
+    if cluster:
+        cluster.record(stream_entry['name'], stream_id, stream_entry['spec'])
+
+    # MediaMTX and registry changes happen here rather than in prepare_stream, after any
+    # instance being replaced has been released (which removes its path configuration)
+    if stream_entry['source_type'] == 'camera':
+        get_camera_registry().register(stream_entry['spec']['camera_url'], stream_entry['name'])
+
+    if stream_entry.get('ingest') == 'pull':
+        attach_camera_path(stream_id, stream_entry)
+    elif stream_entry.get('on_demand'):
+        register_on_demand_stream(stream_id, stream_entry, command)
+    elif stream_entry.get('shared_source'):
+        attach_shared_source(stream_id, stream_entry, command)
+    else:
+        if stream_entry['spec']['enable_recording']:
+            configure_recording(stream_entry['name'])
+
+        stream_entry['readiness'] = StreamReadiness()
+        with stream_lock:
+            active_streams[stream_id] = stream_entry
+
+        thread = threading.Thread(target=start_stream_process, args=(stream_id, command))
+        thread.daemon = True
+        thread.start()
+        start_readiness_monitor()
+
+def release_stream(stream_id):
+    """Stop a stream and remove it from active streams. Returns True if it was running."""
+    with stream_lock:
+        stream_data = active_streams.pop(stream_id, None)
+        if stream_data is None:
+            return False
+        was_running = terminate_stream_process(stream_data.get('process'))
+
+    if stream_data.get('shared_source'):
+        was_running = stream_data['status'] in ('starting', 'running')
+        detach_shared_source(stream_id, stream_data)
+    elif stream_data.get('ingest') == 'pull' or stream_data.get('on_demand'):
+        was_running = stream_data['status'] in ('starting', 'running', 'idle')
+        remove_mediamtx_path(stream_data['name'])
+
+    cluster = get_cluster_node()
+    if cluster:
+        cluster.forget(stream_data['name'])
+
+    return was_running
+
+def cluster_local_streams():
+    """Streams active on this node by name, for cluster reconciliation"""
+    with stream_lock:
+        return {stream_data['name']: stream_id for stream_id, stream_data in active_streams.items()}
+
+def list_remote_streams(cluster):
+    """Streams assigned to other nodes as those nodes list them
+
+    Streams of a node that cannot be asked are listed from their stored spec with status 'unknown'.
+    """
+    by_node = cluster.remote_assignments()
+
+    def list_node(node_id):
+        node = cluster.node(node_id)
+        listed, error = {}, None
+        try:
+            if node is None:
+                raise requests.RequestException('not in the cluster')
+            _, body = request_node(node, 'GET', '/api/streams/list', timeout=5)
+            listed = {stream['id']: stream for stream in body.get('streams', [])}
+        except requests.RequestException as e:
+            error = f'Node {node_id} is unreachable: {e}'
+
+        streams = []
+        for assignment in by_node[node_id]:
+            spec = assignment['spec']
+            stream = listed.get(assignment['stream_id']) or {
+                'id': assignment['stream_id'],
+                'name': assignment['name'],
+                'protocol': spec.get('protocol'),
+                'status': 'unknown',
+                'file': spec.get('file') or f"Camera: {mask_url(spec.get('camera_url') or '')}",
+                'bitrate': spec.get('bitrate'),
+                'resolution': spec.get('resolution') or 'Original',
+                'rtsp_url': '', 'rtmp_url': '', 'srt_url': '', 'webrtc_url': '', 'hls_url': '',
+                'error': error,
+                'on_demand': None,
+                'readiness': None,
+                'live_metrics': {'source_ready': False, 'viewers': 0, 'bytes_received': format_bytes(0),
+                                 'bytes_sent': format_bytes(0), 'health_status': 'unknown'}
+            }
+            stream['node_id'] = node_id
+            streams.append(stream)
+        return streams
+
+    if not by_node:
+        return []
+    with ThreadPoolExecutor(max_workers=len(by_node)) as executor:
+        return [stream for streams in executor.map(list_node, sorted(by_node)) for stream in streams]
+
+def stop_remote_stream(cluster, stream_id):
+    """Stop a stream on the node it is assigned to. Returns an error message, or None on success."""
+    assignment = cluster.find(stream_id=stream_id)
+    if assignment is None or assignment['node_id'] == cluster.node_id:
+        return 'Stream not found'
+    node = cluster.node(assignment['node_id'])
+    if node is None:
+        return f"Node {assignment['node_id']} is not in the cluster"
+    try:
+        status, body = request_node(node, 'POST', f'/api/streams/stop/{stream_id}')
+    except requests.RequestException as e:
+        return f"Node {assignment['node_id']} is unreachable: {e}"
+    return None if status == 200 else body.get('error', f'HTTP {status}')
+
+def adopt_stream(spec, stream_id):
+    """Start a stream the cluster assigned to this node (e.g. moved off a failed node)"""
+    # Skip names that are active or being started here right now, like any other start
+    if reserve_stream_names([spec['name']]):
+        return
+    try:
+        if spec.get('auth_user') and spec.get('auth_pass_sha256'):
+            print(f"Cluster: stream {spec['name']} password is not stored in the cluster, starting it without")
+        _, stream_entry, command = prepare_stream(normalize_stream_spec(spec))
+        launch_stream(stream_id, stream_entry, command)
+    finally:
+        release_stream_names([spec['name']])
+
+def stop_and_save_stream(stream_id):
+    release_stream(stream_id)
+    save_streams_config()
+
+def diff_stream_sets(desired_specs, current_streams, prune=True):
+    """Compute the actions needed to move the active streams to a desired set
+
+    Args:
+        desired_specs: Mapping of stream name to normalized spec.
+        current_streams: Mapping of stream name to (stream_id, stream_data).
+        prune: Stop active streams that are absent from the desired set.
+
+    Returns:
+        dict with 'start', 'stop', 'restart' and 'unchanged' lists of stream names.
+    """
+    plan = {'start': [], 'stop': [], 'restart': [], 'unchanged': []}
+
+    for name, spec in desired_specs.items():
+        if name not in current_streams:
+            plan['start'].append(name)
+            continue
+
+        _, stream_data = current_streams[name]
+        # Compared as stored in the cluster, where streams on other nodes only have password digests
+        current_spec = store_spec(stream_data.get('spec') or {})
+        wanted_spec = store_spec(spec)
+        changed = any(current_spec.get(field) != wanted_spec.get(field) for field in
+                      (f'{field}_sha256' if field in SECRET_SPEC_FIELDS else field for field in STREAM_SPEC_FIELDS))
+        if changed or stream_data['status'] in ('failed', 'stopped'):
+            plan['restart'].append(name)
+        else:
+            plan['unchanged'].append(name)
+
+    if prune:
+        plan['stop'] = [name for name in current_streams if name not in desired_specs]
+
+    return plan
+
 @app.route('/')
 def index():
     """Render main page"""
-    return render_template('index.html')
+    return render_template('index.html', bitrate_tiers=RESOLUTION_TIERS)
 
 @app.route('/api/media/list', methods=['GET'])
 def list_media():
-    """List available media files"""
+    """List available media files
+
+    Query: prefix (path prefix, e.g. promos/), q (name substring), ext (comma-separated), limit, offset.
+    """
     try:
-        files = get_media_files()
-        return jsonify({'success': True, 'files': files})
+        library = get_media_library()
+        library.ready.wait(timeout=5)
+
+        extensions = [ext for ext in request.args.get('ext', '').split(',') if ext]
+        entries, total = library.search(
+            prefix=request.args.get('prefix'),
+            query=request.args.get('q'),
+            extensions=extensions,
+            limit=request.args.get('limit', type=int),
+            offset=request.args.get('offset', 0, type=int)
+        )
+
+        return jsonify({
+            'success': True,
+            'files': [entry['file'] for entry in entries],
+            'items': [dict(entry, size=format_bytes(entry['size_bytes'])) for entry in entries],
+            'total': total,
+            'indexing': not library.ready.is_set()
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/files/browse', methods=['POST'])
 def browse_files():
-    """Browse filesystem for video files"""
+    """Browse filesystem for video files
+
+    Body: path, plus optional cursor (from next_cursor), limit and filter (name substring).
+    Slow directories return the entries read within BROWSE_TIME_BUDGET with partial=true.
+    """
     try:
         data = request.json
         current_path = data.get('path', '/')
@@ -438,54 +1398,22 @@ def browse_files():
         except Exception:
             return jsonify({'success': False, 'error': 'Invalid path'}), 400
 
-        # Check if path exists
-        if not resolved_path.exists():
+        try:
+            listing = file_browser.list_directory(str(resolved_path), cursor=data.get('cursor'),
+                                                  limit=data.get('limit'), name_filter=data.get('filter'))
+        except FileNotFoundError:
             return jsonify({'success': False, 'error': 'Path does not exist'}), 404
-
-        if not resolved_path.is_dir():
+        except NotADirectoryError:
             return jsonify({'success': False, 'error': 'Path is not a directory'}), 400
-
-        items = []
-
-        try:
-            # List directories and video files
-            for item in sorted(resolved_path.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
-                try:
-                    item_info = {
-                        'name': item.name,
-                        'path': str(item),
-                        'is_dir': item.is_dir()
-                    }
-
-                    if item.is_dir():
-                        items.append(item_info)
-                    elif item.is_file():
-                        # Check if it's a video file
-                        ext = item.suffix.lower().lstrip('.')
-                        if ext in app.config['ALLOWED_EXTENSIONS']:
-                            # Get file size
-                            size_bytes = item.stat().st_size
-                            if size_bytes < 1024:
-                                size_str = f'{size_bytes} B'
-                            elif size_bytes < 1024 * 1024:
-                                size_str = f'{size_bytes / 1024:.1f} KB'
-                            elif size_bytes < 1024 * 1024 * 1024:
-                                size_str = f'{size_bytes / (1024 * 1024):.1f} MB'
-                            else:
-                                size_str = f'{size_bytes / (1024 * 1024 * 1024):.2f} GB'
-
-                            item_info['size'] = size_str
-                            items.append(item_info)
-                except (PermissionError, OSError):
-                    # Skip items we can't access
-                    continue
         except PermissionError:
             return jsonify({'success': False, 'error': 'Permission denied'}), 403
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
         return jsonify({
             'success': True,
             'path': str(resolved_path),
-            'items': items
+            **listing
         })
 
     except Exception as e:
@@ -513,6 +1441,10 @@ def upload_media():
             return jsonify({'success': False, 'error': 'File already exists'}), 400
 
         file.save(filepath)
+        file_browser.invalidate(str(Path(app.config['UPLOAD_FOLDER']).resolve()))
+        # API workers have no index of their own; the supervisor's inotify watch sees the new file
+        if media_library is not None:
+            media_library.add_file(filepath)
         return jsonify({'success': True, 'filename': filename})
 
     except Exception as e:
@@ -544,10 +1476,14 @@ def list_streams():
             bytes_received = mtx_info.get('bytesReceived', 0)
             bytes_sent = mtx_info.get('bytesSent', 0)
 
-            # Calculate health status
-            health_status = 'healthy' if source_ready and num_readers >= 0 else 'waiting'
+            # Calculate health status; publishers are only healthy once readiness says so
+            readiness = stream_data.get('readiness')
             if stream_data['status'] == 'failed':
                 health_status = 'error'
+            elif readiness and stream_data['status'] in ('starting', 'running'):
+                health_status = {'ready': 'healthy', 'degraded': 'degraded'}.get(readiness.state, 'waiting')
+            else:
+                health_status = 'healthy' if source_ready else 'waiting'
 
             stream_info = {
                 'id': stream_id,
@@ -556,13 +1492,22 @@ def list_streams():
                 'status': stream_data['status'],
                 'file': stream_data['file'],
                 'bitrate': stream_data.get('bitrate', 'N/A'),
+                'rate_control': stream_data.get('rate_control'),
                 'resolution': stream_data.get('resolution', 'N/A'),
+                'filters': stream_data.get('filters', []),
                 'rtsp_url': stream_data.get('rtsp_url', ''),
                 'rtmp_url': stream_data.get('rtmp_url', ''),
                 'srt_url': stream_data.get('srt_url', ''),
                 'webrtc_url': stream_data.get('webrtc_url', ''),
                 'hls_url': stream_data.get('hls_url', ''),
                 'error': stream_data.get('error'),
+                'shared_source': stream_data.get('shared_source'),
+                'latency_profile': stream_data.get('latency_profile'),
+                'latency': stream_data.get('latency'),
+                'ingest': stream_data.get('ingest'),
+                'ingest_reason': stream_data.get('ingest_reason'),
+                'on_demand': on_demand_stats(stream_data),
+                'readiness': readiness.snapshot() if readiness else None,
                 # Live metrics from MediaMTX
                 'live_metrics': {
                     'source_ready': source_ready,
@@ -574,145 +1519,268 @@ def list_streams():
             }
             streams.append(stream_info)
 
-        return jsonify({'success': True, 'streams': streams})
+    # In a cluster the list covers every node; another node's list request only wants ours
+    cluster = get_cluster_node()
+    if cluster and not request.headers.get(CLUSTER_FORWARD_HEADER):
+        for stream_info in streams:
+            stream_info['node_id'] = cluster.node_id
+        streams.extend(list_remote_streams(cluster))
+
+    return jsonify({'success': True, 'streams': streams})
 
 @app.route('/api/streams/start', methods=['POST'])
 def start_stream():
     """Start a new stream"""
     try:
-        data = request.json
-        video_file = data.get('file')
-        camera_url = data.get('camera_url')
-        stream_name = data.get('name')
-        protocol = data.get('protocol', 'rtsp')
-        bitrate = data.get('bitrate', '2M')
-        resolution = data.get('resolution')
-        hw_accel = data.get('hw_accel')  # Hardware acceleration: nvenc, qsv, vaapi, or None
-        enable_recording = data.get('enable_recording', False)  # Enable recording
-        auth_user = data.get('auth_user')  # Optional authentication username
-        auth_pass = data.get('auth_pass')  # Optional authentication password
-        audio_codec = data.get('audio_codec', 'opus')  # Audio codec: opus (default) or aac
-
-        if not stream_name:
-            return jsonify({'success': False, 'error': 'Stream name is required'}), 400
-
-        # Configure recording in MediaMTX if enabled
-        if enable_recording:
+        spec = normalize_stream_spec(request.json)
+
+        cluster = get_cluster_node()
+        if cluster and not request.headers.get(CLUSTER_FORWARD_HEADER):
+            # Names are unique cluster-wide; new streams go to the least-loaded live node
+            assignment = cluster.find(name=spec['name'])
+            if assignment:
+                return jsonify({'success': False, 'error': f"Stream {spec['name']} already runs on node {assignment['node_id']}"}), 409
+            node = cluster.place()
+            if node and node['node_id'] != cluster.node_id:
+                return forward_to_node(node, 'POST', '/api/streams/start', request.json)
+
+        # Stream names are unique: apply, MediaMTX paths and the cluster all key streams by name
+        if spec['name'] and reserve_stream_names([spec['name']]):
+            return jsonify({'success': False, 'error': f"Stream {spec['name']} already exists"}), 409
+
+        try:
             try:
-                mediamtx_api = f'http://mediamtx:9997/v3/config/paths/patch/{stream_name}'
-                recording_config = {
-                    'record': True,
-                    'recordPath': f'/recordings/{stream_name}/%Y-%m-%d_%H-%M-%S-%f'
-                }
-                requests.patch(mediamtx_api, json=recording_config, timeout=5)
-            except Exception as e:
-                print(f"Warning: Could not configure recording in MediaMTX: {e}")
-
-        # Determine source type
-        is_camera = False
-        if camera_url:
-            # IP Camera source
-            video_source = camera_url
-            is_camera = True
-            source_type = 'camera'
-        elif video_file:
-            # File source - handle both relative filenames and absolute paths
-            if os.path.isabs(video_file):
-                # Absolute path from file browser
-                video_source = video_file
-            else:
-                # Relative filename from dropdown
-                video_source = os.path.join(app.config['UPLOAD_FOLDER'], video_file)
+                wait_timeout = ready_wait_timeout(request.json.get('wait'))
+                stream_id, stream_entry, command = prepare_stream(spec)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            except FileNotFoundError as e:
+                return jsonify({'success': False, 'error': str(e)}), 404
+            except CameraUnreachableError as e:
+                return jsonify({'success': False, 'error': str(e)}), 503
 
-            if not os.path.exists(video_source):
-                return jsonify({'success': False, 'error': 'Video file not found'}), 404
-            source_type = 'file'
-        else:
-            return jsonify({'success': False, 'error': 'Either file or camera_url is required'}), 400
+            try:
+                launch_stream(stream_id, stream_entry, command)
+            except StreamAssignedError as e:
+                return jsonify({'success': False, 'error': str(e)}), 409
+        finally:
+            release_stream_names([spec['name']])
+
+        # Save stream configuration for persistence
+        save_streams_config()
 
-        # Generate unique stream ID
-        stream_id = str(uuid.uuid4())
+        # Optionally hold the response until MediaMTX serves the stream (pulled and idle on-demand streams have nothing to wait for)
+        readiness = stream_entry['readiness']
+        ready = readiness.wait(wait_timeout) if wait_timeout and readiness else None
 
-        # Build FFmpeg command
-        command = build_ffmpeg_command(video_source, stream_name, protocol, bitrate, resolution, is_camera, hw_accel, auth_user, auth_pass, audio_codec)
+        result = {
+            'success': True,
+            'stream_id': stream_id,
+            'rtsp_url': stream_entry['rtsp_url'],
+            'rtmp_url': stream_entry['rtmp_url'],
+            'srt_url': stream_entry['srt_url'],
+            'webrtc_url': stream_entry['webrtc_url'],
+            'hls_url': stream_entry['hls_url'],
+            'latency': stream_entry['latency'],
+            'ingest': stream_entry['ingest'],
+            'ingest_reason': stream_entry['ingest_reason'],
+            'on_demand': on_demand_stats(stream_entry),
+            'ready': ready,
+            'readiness': readiness.snapshot() if readiness else None
+        }
+        if ready is False:
+            # The stream keeps starting in the background; it can be polled or stopped by id
+            with stream_lock:
+                status, error = stream_entry['status'], stream_entry.get('error')
+            if status == 'failed' or readiness.exited:
+                result.update(success=False, error=error or 'Stream exited before becoming ready')
+                return jsonify(result), 502
+            result.update(success=False, error=f'Stream not ready after {wait_timeout:g}s')
+            return jsonify(result), 504
+
+        return jsonify(result)
 
-        # Generate all stream URLs (MediaMTX provides all protocols from single input)
-        server_ip = get_server_ip()
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # Add authentication to URLs if provided
-        if auth_user and auth_pass:
-            auth_prefix = f'{auth_user}:{auth_pass}@'
-            rtsp_url = f'rtsp://{auth_prefix}{server_ip}:8554/{stream_name}'
-            rtmp_url = f'rtmp://{auth_prefix}{server_ip}:1935/{stream_name}'
-        else:
-            rtsp_url = f'rtsp://{server_ip}:8554/{stream_name}'
-            rtmp_url = f'rtmp://{server_ip}:1935/{stream_name}'
+@app.route('/api/streams/apply', methods=['POST'])
+def apply_streams():
+    """Reconcile active streams against a declarative set of stream specs
 
-        srt_url = f'srt://{server_ip}:8890?streamid=read:{stream_name}'
-        webrtc_url = f'http://{server_ip}:8889/{stream_name}'
-        hls_url = f'http://{server_ip}:8888/{stream_name}/index.m3u8'
+    Streams missing from the set are stopped (unless prune is false), new ones are
+    started and ones whose spec changed are restarted. Every start is prepared first;
+    if any spec is invalid nothing is stopped or started. Starts run concurrently up to
+    MAX_CONCURRENT_STARTS and the configuration file is written once at the end. In a
+    cluster the set covers the streams of every node: stops go to the owning node and
+    starts are placed like /api/streams/start.
+    """
+    try:
+        data = request.json or {}
+        desired = data.get('streams')
+        prune = data.get('prune', True)
+        dry_run = data.get('dry_run', False)
+
+        if not isinstance(desired, list):
+            return jsonify({'success': False, 'error': 'streams must be a list of stream specs'}), 400
+
+        desired_specs = {}
+        for item in desired:
+            spec = normalize_stream_spec(item)
+            if not spec['name']:
+                return jsonify({'success': False, 'error': 'Stream name is required'}), 400
+            if spec['name'] in desired_specs:
+                return jsonify({'success': False, 'error': f"Duplicate stream name: {spec['name']}"}), 400
+            desired_specs[spec['name']] = spec
+
+        cluster = get_cluster_node()
+        if request.headers.get(CLUSTER_FORWARD_HEADER):
+            cluster = None
+
+        with apply_lock:
+            with stream_lock:
+                current_streams = {stream_data['name']: (stream_id, stream_data) for stream_id, stream_data in active_streams.items()}
+            if cluster:
+                for node_id, assignments in cluster.remote_assignments().items():
+                    for assignment in assignments:
+                        # Their status isn't known here; an assigned stream counts as running
+                        current_streams.setdefault(assignment['name'], (assignment['stream_id'], {
+                            'name': assignment['name'], 'spec': assignment['spec'], 'status': 'running', 'node_id': node_id}))
+
+            plan = diff_stream_sets(desired_specs, current_streams, prune)
+            if dry_run:
+                return jsonify({'success': True, 'dry_run': True, **plan})
+
+            # A single /api/streams/start may be creating one of the new names right now
+            taken = reserve_stream_names(plan['start'], replacing=plan['restart'])
+            if taken:
+                return jsonify({'success': False, 'error': f"Streams are being started concurrently: {', '.join(taken)}"}), 409
+            try:
+                return apply_stream_plan(plan, desired_specs, current_streams, cluster)
+            finally:
+                release_stream_names(plan['start'] + plan['restart'])
 
-        # Store stream info
-        with stream_lock:
-            active_streams[stream_id] = {
-                'name': stream_name,
-                'protocol': protocol,
-                'status': 'starting',
-                'file': video_file if not is_camera else f'Camera: {camera_url}',
-                'source_type': source_type,
-                'bitrate': bitrate,
-                'resolution': resolution or 'Original',
-                'rtsp_url': rtsp_url,
-                'rtmp_url': rtmp_url,
-                'srt_url': srt_url,
-                'webrtc_url': webrtc_url,
-                'hls_url': hls_url,
-                'process': None
-            }
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # Start stream in background thread
-        thread = threading.Thread(target=start_stream_process, args=(stream_id, command))
-        thread.daemon = True
-        thread.start()
+def apply_stream_plan(plan, desired_specs, current_streams, cluster=None):
+    """Carry out an apply plan: prepare all starts, then stop, then launch (placing starts across the cluster)"""
+    # Validate and build every new stream before touching running ones, so a bad spec stops nothing
+    to_start = plan['start'] + plan['restart']
+    prepared = {}
+    failures = []
 
-        # Save stream configuration for persistence
-        save_streams_config()
+    def prepare_one(name):
+        try:
+            prepared[name] = prepare_stream(desired_specs[name])
+        except Exception as e:
+            failures.append(f"Error preparing {name}: {str(e)}")
+
+    if to_start:
+        workers = max(1, min(app.config['MAX_CONCURRENT_STARTS'], len(to_start)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(prepare_one, to_start))
+    if failures:
+        return jsonify({'success': False, 'error': 'No changes applied', 'errors': failures, **plan}), 400
+
+    errors = []
+    stream_ids = {}
+
+    # Stops (and the stop half of restarts) only signal processes, so do them inline
+    for name in plan['stop'] + plan['restart']:
+        stream_id, stream_data = current_streams[name]
+        try:
+            if stream_data.get('node_id'):
+                error = stop_remote_stream(cluster, stream_id)
+                if error:
+                    errors.append(f"Error stopping {name}: {error}")
+            else:
+                release_stream(stream_id)
+        except Exception as e:
+            errors.append(f"Error stopping {name}: {str(e)}")
 
-        return jsonify({
-            'success': True,
-            'stream_id': stream_id,
-            'rtsp_url': rtsp_url,
-            'rtmp_url': rtmp_url,
-            'srt_url': srt_url,
-            'webrtc_url': webrtc_url,
-            'hls_url': hls_url
-        })
+    # After the stops, so the nodes they freed count as less loaded
+    placement = dict(zip(to_start, cluster.place_many(len(to_start)))) if cluster and to_start else {}
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    def launch_one(name):
+        try:
+            node = placement.get(name)
+            if node and node['node_id'] != cluster.node_id:
+                status, body = request_node(node, 'POST', '/api/streams/start', desired_specs[name])
+                if status != 200:
+                    raise RuntimeError(f"node {node['node_id']}: {body.get('error')}")
+                stream_ids[name] = body['stream_id']
+                return
+            stream_id, stream_entry, command = prepared[name]
+            launch_stream(stream_id, stream_entry, command)
+            stream_ids[name] = stream_id
+        except Exception as e:
+            errors.append(f"Error starting {name}: {str(e)}")
+
+    if to_start:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(launch_one, to_start))
+
+    for name in plan['unchanged']:
+        stream_ids[name] = current_streams[name][0]
+
+    # Persist the reconciled set once
+    save_streams_config()
+
+    return jsonify({
+        'success': not errors,
+        **plan,
+        'stream_ids': stream_ids,
+        'errors': errors
+    }), 500 if errors else 200
+
+@app.route('/api/streams/readiness', methods=['GET'])
+def stream_readiness():
+    """Time-to-ready histograms by stream kind against the start-latency SLO, and each stream's readiness"""
+    slo_seconds = app.config['READY_SLO_SECONDS']
+    with stream_lock:
+        streams = [{'id': stream_id, 'name': stream_data['name'], 'status': stream_data['status'],
+                    'readiness': stream_data['readiness'].snapshot() if stream_data.get('readiness') else None}
+                   for stream_id, stream_data in active_streams.items()]
+
+    return jsonify({
+        'success': True,
+        'slo_seconds': slo_seconds,
+        'time_to_ready': {kind: histogram.snapshot(slo_seconds) for kind, histogram in time_to_ready.items()},
+        'streams': streams
+    })
+
+@app.route('/api/streams/demand/<path:stream_name>', methods=['POST'])
+def demand_stream(stream_name):
+    """MediaMTX runOnDemand callback: a reader wants an idle on-demand stream"""
+    with stream_lock:
+        stream_id = next((sid for sid, stream_data in active_streams.items()
+                          if stream_data['name'] == stream_name and stream_data.get('on_demand')), None)
+
+    if stream_id is None or not activate_stream(stream_id):
+        return jsonify({'success': False, 'error': 'On-demand stream not found'}), 404
+
+    return jsonify({'success': True, 'stream_id': stream_id})
 
 @app.route('/api/streams/stop/<stream_id>', methods=['POST'])
 def stop_stream(stream_id):
     """Stop a running stream"""
     try:
         with stream_lock:
-            if stream_id not in active_streams:
-                return jsonify({'success': False, 'error': 'Stream not found'}), 404
-
-            stream_data = active_streams[stream_id]
-            process = stream_data.get('process')
+            is_local = stream_id in active_streams
 
-            if process and process.poll() is None:
-                # Terminate process gracefully
-                if os.name != 'nt':
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                else:
-                    process.terminate()
-
-                stream_data['status'] = 'stopped'
+        if not is_local:
+            # In a cluster the stream may run on another node
+            cluster = get_cluster_node()
+            assignment = cluster.find(stream_id=stream_id) if cluster else None
+            if assignment is None or assignment['node_id'] == cluster.node_id:
+                return jsonify({'success': False, 'error': 'Stream not found'}), 404
+            node = cluster.node(assignment['node_id'])
+            if node is None:
+                return jsonify({'success': False, 'error': f"Node {assignment['node_id']} is not in the cluster"}), 503
+            return forward_to_node(node, 'POST', f'/api/streams/stop/{stream_id}')
 
-            # Remove from active streams
-            del active_streams[stream_id]
+        # Terminate process gracefully and remove from active streams
+        release_stream(stream_id)
 
         # Update saved configuration
         save_streams_config()
@@ -728,25 +1796,132 @@ def stop_all_streams():
     try:
         stopped_count = 0
         with stream_lock:
-            for stream_id, stream_data in list(active_streams.items()):
-                process = stream_data.get('process')
-                if process and process.poll() is None:
-                    if os.name != 'nt':
-                        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    else:
-                        process.terminate()
-                    stopped_count += 1
+            stream_ids = list(active_streams)
 
-            active_streams.clear()
+        for stream_id in stream_ids:
+            if release_stream(stream_id):
+                stopped_count += 1
 
         # Update saved configuration
         save_streams_config()
 
-        return jsonify({'success': True, 'stopped': stopped_count})
+        # Streams placed on other nodes are stopped by those nodes
+        errors = []
+        cluster = get_cluster_node()
+        if cluster and not request.headers.get(CLUSTER_FORWARD_HEADER):
+            for node_id in cluster.remote_assignments():
+                node = cluster.node(node_id)
+                try:
+                    if node is None:
+                        raise requests.RequestException('not in the cluster')
+                    status, body = request_node(node, 'POST', '/api/streams/stop-all')
+                    stopped_count += body.get('stopped', 0)
+                    if status != 200:
+                        errors.append(f"Error stopping streams on node {node_id}: {body.get('error')}")
+                except requests.RequestException as e:
+                    errors.append(f'Node {node_id} is unreachable: {e}')
+
+        return jsonify({'success': not errors, 'stopped': stopped_count, 'errors': errors})
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/cluster/status', methods=['GET'])
+def cluster_status():
+    """Cluster nodes with liveness and load, and the node each stream is assigned to"""
+    try:
+        cluster = get_cluster_node()
+        if cluster is None:
+            return jsonify({'success': True, 'enabled': False})
+        return jsonify({'success': True, 'enabled': True, **cluster.status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/latency-profiles', methods=['GET'])
+def list_latency_profiles():
+    """List latency profiles with their settings resolved for a frame rate (?fps=, default 30)"""
+    try:
+        frame_rate = float(request.args.get('fps', 30))
+        if frame_rate <= 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'success': False, 'error': 'fps must be a positive number'}), 400
+
+    profiles = []
+    for name in LATENCY_PROFILES:
+        settings = resolve_latency_profile(name, frame_rate)
+        profiles.append({
+            'name': name,
+            'description': settings['description'],
+            'gop': settings['gop'],
+            'b_frames': settings['b_frames'],
+            'lookahead': settings['lookahead'],
+            'bufsize_seconds': settings['bufsize_seconds'],
+            'webrtc_compatible': webrtc_compatible(settings),
+            'expected_latency': settings['expected_latency']
+        })
+
+    return jsonify({'success': True, 'default': DEFAULT_LATENCY_PROFILE, 'profiles': profiles})
+
+@app.route('/api/shared-sources/list', methods=['GET'])
+def list_shared_sources():
+    """List shared file-source publishers and the streams fed from each"""
+    with stream_lock:
+        sources = []
+        for key, source in shared_sources.items():
+            sources.append({
+                'key': key,
+                'path': source['path'],
+                'file': source['file'],
+                'status': source['status'],
+                'streams': sorted(active_streams[stream_id]['name'] for stream_id in source['refs']
+                                  if stream_id in active_streams)
+            })
+
+    return jsonify({'success': True, 'sources': sources})
+
+@app.route('/api/cameras/list', methods=['GET'])
+def list_cameras():
+    """List registered cameras with reachability, latency and last-seen codec parameters"""
+    return jsonify({'success': True, 'cameras': get_camera_registry().list()})
+
+@app.route('/api/cameras/add', methods=['POST'])
+def add_camera():
+    """Register a camera for scheduled health probing"""
+    data = request.json or {}
+    url = data.get('url')
+    if not url or not url.startswith(('rtsp://', 'rtsps://', 'rtmp://')):
+        return jsonify({'success': False, 'error': 'A camera rtsp:// or rtmp:// url is required'}), 400
+
+    created = get_camera_registry().register(url, data.get('name'))
+    return jsonify({'success': True, 'created': created})
+
+@app.route('/api/cameras/remove', methods=['POST'])
+def remove_camera():
+    """Remove a camera from the registry (by name or url)"""
+    data = request.json or {}
+    registry = get_camera_registry()
+    url = registry.find(data.get('camera', ''))
+    if url is None or not registry.remove(url):
+        return jsonify({'success': False, 'error': 'Camera not found'}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/cameras/probe', methods=['POST'])
+def probe_cameras():
+    """Re-probe one camera (by name or url) or all cameras now, including codec parameters"""
+    data = request.json or {}
+    registry = get_camera_registry()
+
+    if data.get('camera'):
+        url = registry.find(data['camera'])
+        if url is None:
+            return jsonify({'success': False, 'error': 'Camera not found'}), 404
+        registry.probe(url, full=True)
+    else:
+        registry.probe_all(full=True)
+
+    return jsonify({'success': True, 'cameras': registry.list()})
+
 @app.route('/api/recordings/list', methods=['GET'])
 def list_recordings():
     """List all recordings organized by stream path"""
@@ -849,22 +2024,23 @@ def bulk_stop_streams():
 
         stopped_count = 0
         errors = []
+        cluster = get_cluster_node()
+        if request.headers.get(CLUSTER_FORWARD_HEADER):
+            cluster = None
 
         for stream_id in stream_ids:
             try:
                 with stream_lock:
-                    if stream_id in active_streams:
-                        stream_data = active_streams[stream_id]
-                        process = stream_data.get('process')
-
-                        if process and process.poll() is None:
-                            if os.name != 'nt':
-                                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                            else:
-                                process.terminate()
-                            stopped_count += 1
-
-                        del active_streams[stream_id]
+                    is_local = stream_id in active_streams
+                if not is_local and cluster:
+                    # Placed on another node
+                    error = stop_remote_stream(cluster, stream_id)
+                    if error:
+                        errors.append(f"Error stopping {stream_id}: {error}")
+                    else:
+                        stopped_count += 1
+                elif release_stream(stream_id):
+                    stopped_count += 1
             except Exception as e:
                 errors.append(f"Error stopping {stream_id}: {str(e)}")
 
@@ -967,13 +2143,30 @@ def export_obs_config(stream_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-if __name__ == '__main__':
+def start_manager():
+    """Start stream management in this process: camera probing, cluster membership and saved streams
+
+    Call this only in the one process that owns the FFmpeg processes (the development server
+    or supervisor.py), never in API workers.
+    """
     # Ensure upload directory exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    # Load and auto-start saved streams
-    print("Loading saved stream configurations...")
-    load_streams_config()
+    # Start camera health probing in the background
+    get_camera_registry()
+
+    if get_cluster_node():
+        # Streams assigned to this node are started by the cluster reconcile loop
+        print(f"Joined cluster as node {app.config['CLUSTER_NODE_ID']}")
+    else:
+        # Load and auto-start saved streams
+        print("Loading saved stream configurations...")
+        load_streams_config()
+
+if __name__ == '__main__':
+    # Build the media library index in the background
+    get_media_library()
+    start_manager()
 
-    # Run Flask app
+    # Run Flask app (development server; see wsgi.py and supervisor.py for production serving)
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+MediaMTX Stream Manager - Benchmark / Load Test
+Starts N synthetic streams against a local MediaMTX stand-in and measures
+start, start-to-ready, list and stop latencies plus threads, FDs and RSS
+
+Usage:
+    python benchmark.py --streams 50 --output report.json
+    python benchmark.py --streams 50 --compare report.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tracked metrics where a larger value is a regression
+REGRESSION_METRICS = [
+    ('start_ms', 'p95'),
+    ('ready_ms', 'p95'),
+    ('list_ms', 'p95'),
+    ('stop_ms', 'p95'),
+    ('resources', 'manager_rss_per_stream_kb'),
+    ('resources', 'publisher_rss_per_stream_kb'),
+    ('resources', 'threads_per_stream'),
+    ('resources', 'fds_per_stream'),
+    ('resources', 'leaked_threads'),
+    ('resources', 'leaked_fds')
+]
+
+# Python publisher used when FFmpeg is not installed: pushes filler bytes at the stream bitrate
+# and reports progress like FFmpeg's -progress pipe:1 so readiness tracking sees it publish
+PYTHON_PUBLISHER = r'''
+import socket, sys, time
+host, port, path, bps = sys.argv[1], int(sys.argv[2]), sys.argv[3], int(sys.argv[4])
+sock = socket.create_connection((host, port))
+sock.sendall(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nTransfer-Encoding: chunked\r\n\r\n".encode())
+chunk = b"\x47" * 1316
+interval = len(chunk) * 8 / bps
+began = reported = time.monotonic()
+frames = 0
+while True:
+    sock.sendall(b"%x\r\n" % len(chunk) + chunk + b"\r\n")
+    frames += 1
+    if frames == 1 or time.monotonic() - reported >= 0.5:
+        reported = time.monotonic()
+        print(f"frame={frames}\nout_time_us={int((reported - began) * 1e6)}\nspeed=1x\nprogress=continue", flush=True)
+    time.sleep(interval)
+'''
+
+def mediamtx_time(timestamp):
+    """Format epoch seconds the way the MediaMTX API reports times (RFC 3339, UTC)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+class MediaMTXStandIn:
+    """Minimal MediaMTX replacement: the v3 paths/config API plus an HTTP publish receiver
+
+    Publishers POST a stream body to /publish/<path>; the path reports ready once the
+    first bytes arrive and stops being listed when the connection closes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paths = {}
+        self.configured = {}
+        self.configured_at = {}
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload=None):
+                body = json.dumps(payload or {}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith('/v3/paths/list'):
+                    self._send(200, {'items': standin.list_paths()})
+                elif self.path.startswith('/v3/paths/get/'):
+                    name = self.path[len('/v3/paths/get/'):]
+                    item = next((p for p in standin.list_paths() if p['name'] == name), None)
+                    self._send(200 if item else 404, item)
+                else:
+                    self._send(404)
+
+            def do_POST(self):
+                if self.path.startswith('/publish/'):
+                    standin.receive(self.path[len('/publish/'):], self.rfile)
+                    try:
+                        self._send(200)
+                    except OSError:
+                        # Publisher was killed rather than closing its upload
+                        pass
+                elif self.path.startswith('/v3/config/paths/add/'):
+                    standin.configure(self.path[len('/v3/config/paths/add/'):], self._body())
+                    self._send(200)
+                else:
+                    self._send(404)
+
+            def do_PATCH(self):
+                if self.path.startswith('/v3/config/paths/patch/'):
+                    standin.configure(self.path[len('/v3/config/paths/patch/'):], self._body())
+                    self._send(200)
+                else:
+                    self._send(404)
+
+            def do_DELETE(self):
+                if self.path.startswith('/v3/config/paths/delete/'):
+                    with standin.lock:
+                        standin.configured.pop(self.path[len('/v3/config/paths/delete/'):], None)
+                        standin.configured_at.pop(self.path[len('/v3/config/paths/delete/'):], None)
+                    self._send(200)
+                else:
+                    self._send(404)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def configure(self, name, config):
+        with self.lock:
+            self.configured.setdefault(name, {}).update(config)
+            self.configured_at.setdefault(name, time.time())
+
+    def receive(self, name, stream):
+        """Consume a publisher's body until it disconnects"""
+        entry = {'name': name, 'ready': False, 'readyTime': None, 'bytesReceived': 0}
+        with self.lock:
+            self.paths[name] = entry
+        try:
+            while True:
+                chunk = stream.read1(65536)
+                if not chunk:
+                    break
+                entry['bytesReceived'] += len(chunk)
+                if not entry['ready']:
+                    entry['ready'] = True
+                    entry['readyTime'] = time.time()
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if self.paths.get(name) is entry:
+                    del self.paths[name]
+
+    def list_paths(self):
+        with self.lock:
+            items = [{'name': p['name'], 'ready': p['ready'], 'readyTime': p['readyTime'] and mediamtx_time(p['readyTime']),
+                      'readers': [], 'bytesReceived': p['bytesReceived'], 'bytesSent': 0} for p in self.paths.values()]
+            # Paths pulling from another path (shared sources) are ready when their source is
+            published = {p['name']: p for p in self.paths.values()}
+            for name, config in self.configured.items():
+                source = config.get('source', '')
+                upstream = published.get(source.rsplit('/', 1)[-1]) if source.startswith('rtsp://') else None
+                if name not in published:
+                    # The path pulls once it exists and its source publishes, whichever is later
+                    ready = bool(upstream and upstream['ready'])
+                    ready_time = max(upstream['readyTime'], self.configured_at[name]) if ready else None
+                    items.append({'name': name, 'ready': ready, 'readyTime': ready_time and mediamtx_time(ready_time),
+                                  'readers': [], 'bytesReceived': upstream['bytesReceived'] if upstream else 0,
+                                  'bytesSent': 0})
+        return items
+
+def synthetic_command(command, stream_name, port, publisher, size):
+    """Replace the input of a manager-built FFmpeg command with a lavfi test source and
+    its output with the stand-in receiver, keeping the manager's encoder settings"""
+    url = f'http://127.0.0.1:{port}/publish/{stream_name}'
+
+    if publisher == 'python':
+        bitrate = command[command.index('-maxrate') + 1] if '-maxrate' in command else '2M'
+        from ratecontrol import parse_bitrate
+        return [sys.executable, '-c', PYTHON_PUBLISHER, '127.0.0.1', str(port),
+                f'/publish/{stream_name}', str(parse_bitrate(bitrate))]
+
+    # Keep -nostats -progress pipe:1: readiness needs FFmpeg's progress reports and input log line
+    progress_opts = command[1:command.index('pipe:1') + 1] if 'pipe:1' in command else []
+    encode_start = command.index('-c:v')
+    output_start = len(command) - 1 - command[::-1].index('-f')
+    return ['ffmpeg', '-hide_banner'] + progress_opts + ['-re',
+            '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=30',
+            '-f', 'lavfi', '-i', 'sine=frequency=1000:sample_rate=48000'] + \
+        command[encode_start:output_start] + ['-f', 'mpegts', '-method', 'POST', url]
+
+def percentiles(samples):
+    """Summary statistics in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.mean(ordered), 2),
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2)
+    }
+
+def read_rss_kb(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def count_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return 0
+
+def run_benchmark(args):
+    standin = MediaMTXStandIn()
+    standin.start()
+    os.environ['MEDIAMTX_HOST'] = '127.0.0.1'
+    os.environ['MEDIAMTX_API_PORT'] = str(standin.port)
+
+    workdir = tempfile.mkdtemp(prefix='stream-bench-')
+    source_file = os.path.join(workdir, 'synthetic.mp4')
+    open(source_file, 'wb').close()
+
+    import app as manager
+    manager.app.config['UPLOAD_FOLDER'] = workdir
+    manager.app.config['STREAMS_CONFIG_FILE'] = os.path.join(workdir, 'streams_config.json')
+
+    build_command = manager.build_ffmpeg_command
+    manager.build_ffmpeg_command = lambda video_source, stream_name, *a, **kw: synthetic_command(
+        build_command(video_source, stream_name, *a, **kw), stream_name, standin.port, args.publisher, args.size)
+    manager.probe_frame_rate = lambda video_source: 30.0
+
+    client = manager.app.test_client()
+    names = [f'bench_{i:04d}' for i in range(args.streams)]
+    spec = {'file': 'synthetic.mp4', 'bitrate': args.bitrate, 'latency_profile': args.latency_profile,
+            'shared_source': args.shared}
+
+    baseline = {'threads': threading.active_count(), 'fds': count_fds(), 'rss_kb': read_rss_kb()}
+
+    # Start
+    start_ms = []
+    requested = {}
+    wall_start = time.perf_counter()
+    if args.mode == 'apply':
+        began = time.perf_counter()
+        response = client.post('/api/streams/apply', json={'streams': [dict(spec, name=n) for n in names]})
+        start_ms.append((time.perf_counter() - began) * 1000)
+        for name in names:
+            requested[name] = began
+        if not response.json.get('success'):
+            raise RuntimeError(f"apply failed: {response.json}")
+    else:
+        for name in names:
+            began = time.perf_counter()
+            response = client.post('/api/streams/start', json=dict(spec, name=name))
+            start_ms.append((time.perf_counter() - began) * 1000)
+            requested[name] = began
+            if not response.json.get('success'):
+                raise RuntimeError(f"start failed for {name}: {response.json}")
+
+    # Wait for every stream to report ready through /api/streams/list
+    ready_ms = {}
+    deadline = time.perf_counter() + args.ready_timeout
+    while len(ready_ms) < len(names) and time.perf_counter() < deadline:
+        for stream in client.get('/api/streams/list').json['streams']:
+            name = stream['name']
+            if name not in ready_ms and stream['live_metrics']['source_ready']:
+                ready_ms[name] = (time.perf_counter() - requested[name]) * 1000
+        time.sleep(0.05)
+    all_ready_seconds = time.perf_counter() - wall_start
+
+    # Steady-state resources
+    children = [data['process'].pid for data in list(manager.active_streams.values()) if data.get('process')]
+    children += [source['process'].pid for source in list(manager.shared_sources.values()) if source.get('process')]
+    loaded = {'threads': threading.active_count(), 'fds': count_fds(), 'rss_kb': read_rss_kb()}
+    publisher_rss_kb = sum(read_rss_kb(pid) for pid in children)
+
+    # List latency with N streams
+    list_ms = []
+    for _ in range(args.list_iterations):
+        began = time.perf_counter()
+        client.get('/api/streams/list')
+        list_ms.append((time.perf_counter() - began) * 1000)
+
+    # Stop
+    stop_ms = []
+    for stream_id in list(manager.active_streams):
+        began = time.perf_counter()
+        client.post(f'/api/streams/stop/{stream_id}')
+        stop_ms.append((time.perf_counter() - began) * 1000)
+
+    # Give supervisor threads time to reap their processes before checking for leaks
+    deadline = time.perf_counter() + 10
+    while threading.active_count() > baseline['threads'] + 2 and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    after = {'threads': threading.active_count(), 'fds': count_fds()}
+
+    standin.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    count = max(1, args.streams)
+    return {
+        'config': {
+            'streams': args.streams,
+            'mode': args.mode,
+            'publisher': args.publisher,
+            'shared': args.shared,
+            'bitrate': args.bitrate,
+            'latency_profile': args.latency_profile,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'ready': {
+            'streams_ready': len(ready_ms),
+            'streams_total': len(names),
+            'all_ready_seconds': round(all_ready_seconds, 2)
+        },
+        'start_ms': percentiles(start_ms),
+        'ready_ms': percentiles(list(ready_ms.values())),
+        'list_ms': percentiles(list_ms),
+        'stop_ms': percentiles(stop_ms),
+        'resources': {
+            'threads_per_stream': round((loaded['threads'] - baseline['threads']) / count, 2),
+            'fds_per_stream': round((loaded['fds'] - baseline['fds']) / count, 2),
+            'manager_rss_per_stream_kb': round((loaded['rss_kb'] - baseline['rss_kb']) / count, 1),
+            'publisher_rss_per_stream_kb': round(publisher_rss_kb / count, 1),
+            'leaked_threads': max(0, after['threads'] - baseline['threads']),
+            'leaked_fds': max(0, after['fds'] - baseline['fds'])
+        }
+    }
+
+def compare_reports(report, baseline, threshold):
+    """Return a list of regression messages for metrics that grew by more than threshold"""
+    regressions = []
+    for section, metric in REGRESSION_METRICS:
+        old = baseline.get(section, {}).get(metric)
+        new = report.get(section, {}).get(metric)
+        if old is None or new is None:
+            continue
+        # Small absolute values (a few ms, one thread) are noise, not regressions
+        if new > old * (1 + threshold) and new - old > 1:
+            regressions.append(f'{section}.{metric}: {old} -> {new}')
+    return regressions
+
+def print_report(report):
+    config = report['config']
+    print(f"\nStreams: {config['streams']}  mode: {config['mode']}  publisher: {config['publisher']}"
+          f"  shared: {config['shared']}")
+    print(f"Ready: {report['ready']['streams_ready']}/{report['ready']['streams_total']}"
+          f" in {report['ready']['all_ready_seconds']}s")
+    print(f"{'latency (ms)':<14}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    for key in ('start_ms', 'ready_ms', 'list_ms', 'stop_ms'):
+        stats = report[key]
+        if stats.get('count'):
+            print(f"{key:<14}{stats['count']:>8}{stats['mean']:>10}{stats['p50']:>10}{stats['p95']:>10}{stats['max']:>10}")
+    for key, value in report['resources'].items():
+        print(f"{key:<30}{value:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stream manager with synthetic streams')
+    parser.add_argument('--streams', type=int, default=10, help='number of streams to start')
+    parser.add_argument('--mode', choices=('start', 'apply'), default='start',
+                        help='start streams one by one or with a single /api/streams/apply')
+    parser.add_argument('--publisher', choices=('ffmpeg', 'python'),
+                        default='ffmpeg' if shutil.which('ffmpeg') else 'python',
+                        help='ffmpeg encodes a lavfi test source with the manager settings; '
+                             'python only pushes filler bytes (no encode cost)')
+    parser.add_argument('--shared', action='store_true', help='use one shared file source for all streams')
+    parser.add_argument('--bitrate', default='1M')
+    parser.add_argument('--size', default='640x360', help='lavfi test source frame size')
+    parser.add_argument('--latency-profile', default='low')
+    parser.add_argument('--ready-timeout', type=float, default=30.0)
+    parser.add_argument('--list-iterations', type=int, default=20)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative growth before failing')
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_reports(report, json.load(f), args.threshold)
+        if regressions:
+            print('\nRegressions:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nNo regressions against baseline')
+
+    if report['ready']['streams_ready'] < report['ready']['streams_total']:
+        sys.exit(2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+MediaMTX Stream Manager - Camera Registry
+Tracks IP cameras, probes them concurrently on a schedule and caches their
+reachability, latency and codec parameters
+
+Every interval each camera gets a cheap TCP connect check; a full ffprobe runs
+only when its codec parameters are missing, stale, or the camera just came back.
+The start path uses the cached parameters to give FFmpeg the known video decoder
+and a tight probesize / analyzeduration instead of probing the stream again, to
+derive the keyframe interval from the known frame rate, and to decide whether
+MediaMTX can pull the camera directly (no FFmpeg at all).
+"""
+
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'rtsp': 554, 'rtsps': 322, 'rtmp': 1935, 'http': 80, 'https': 443}
+
+# transcode: FFmpeg pulls the camera and re-encodes (default); pull: MediaMTX pulls the camera itself
+CAMERA_MODES = ('transcode', 'pull')
+DEFAULT_CAMERA_MODE = 'transcode'
+
+# Sources MediaMTX can pull natively
+PULL_SCHEMES = ('rtsp', 'rtsps', 'rtmp', 'rtmps', 'srt')
+# H.264 is the only video codec every MediaMTX reader (RTSP, RTMP, HLS, WebRTC, SRT) can take
+PASSTHROUGH_VIDEO_CODECS = {'h264'}
+# Camera audio codecs that satisfy the requested output audio codec without re-encoding
+PASSTHROUGH_AUDIO_CODECS = {
+    'opus': {'opus', 'pcm_mulaw', 'pcm_alaw'},  # what WebRTC readers accept
+    'aac': {'aac'}
+}
+
+class CameraUnreachableError(Exception):
+    """Raised when a stream is started for a camera the last probe found unreachable"""
+
+def mask_url(url):
+    """Hide the password in a camera URL"""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = f'{parts.username}:***@{parts.hostname}' + (f':{parts.port}' if parts.port else '')
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+def parse_frame_rate(value):
+    num, _, den = (value or '0/0').partition('/')
+    try:
+        if den and float(den) > 0 and float(num) > 0:
+            return round(float(num) / float(den), 3)
+    except ValueError:
+        pass
+    return None
+
+class CameraRegistry:
+    """Registry of cameras with scheduled health probing"""
+
+    def __init__(self, config_file, interval=30.0, params_max_age=600.0, workers=16):
+        self.config_file = config_file
+        self.interval = interval
+        self.params_max_age = params_max_age
+        self.cameras = {}  # url -> camera record
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='camera-probe')
+        self._started = False
+        self._pending = {}  # url -> Future of the initial probe started by register()
+        self._probed = {}  # url -> params probed before the camera was registered
+
+    # Persistence
+
+    def load(self):
+        try:
+            if not os.path.exists(self.config_file):
+                return
+            with open(self.config_file) as f:
+                saved = json.load(f)
+            with self.lock:
+                for record in saved:
+                    record.setdefault('reachable', None)
+                    record.setdefault('latency_ms', None)
+                    record.setdefault('last_checked', None)
+                    record.setdefault('error', None)
+                    self.cameras[record['url']] = record
+        except Exception as e:
+            print(f"Error loading camera registry: {e}")
+
+    def save(self):
+        try:
+            with self.lock:
+                saved = [{'name': c['name'], 'url': c['url'], 'params': c.get('params'),
+                          'params_updated': c.get('params_updated')} for c in self.cameras.values()]
+            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+            with open(self.config_file, 'w') as f:
+                json.dump(saved, f, indent=2)
+        except Exception as e:
+            print(f"Error saving camera registry: {e}")
+
+    # Registration
+
+    def register(self, url, name=None):
+        """Add a camera (no-op if already known). Returns True if it was new."""
+        with self.lock:
+            if url in self.cameras:
+                if name and not self.cameras[url].get('name'):
+                    self.cameras[url]['name'] = name
+                return False
+            # Parameters probed while the stream was prepared are fresh; the first probe keeps them
+            params = self._probed.pop(url, None)
+            self.cameras[url] = {
+                'name': name or mask_url(url),
+                'url': url,
+                'reachable': None,
+                'latency_ms': None,
+                'last_checked': None,
+                'error': None,
+                'params': params,
+                'params_updated': time.time() if params else None
+            }
+        self.save()
+        # Probe the new camera right away so the next start can use its parameters
+        future = self.executor.submit(self.probe, url)
+        with self.lock:
+            self._pending[url] = future
+        future.add_done_callback(lambda _: self._forget_pending(url, future))
+        return True
+
+    def _forget_pending(self, url, future):
+        with self.lock:
+            if self._pending.get(url) is future:
+                del self._pending[url]
+
+    def remove(self, url):
+        with self.lock:
+            removed = self.cameras.pop(url, None) is not None
+        if removed:
+            self.save()
+        return removed
+
+    def find(self, name_or_url):
+        with self.lock:
+            if name_or_url in self.cameras:
+                return name_or_url
+            for url, camera in self.cameras.items():
+                if camera['name'] == name_or_url:
+                    return url
+        return None
+
+    def get(self, url):
+        with self.lock:
+            camera = self.cameras.get(url)
+            return dict(camera) if camera else None
+
+    def list(self):
+        """Camera records with credentials masked"""
+        with self.lock:
+            cameras = [dict(camera) for camera in self.cameras.values()]
+        for camera in cameras:
+            camera['url'] = mask_url(camera['url'])
+        return sorted(cameras, key=lambda c: c['name'])
+
+    # Probing
+
+    def _tcp_check(self, url):
+        """Connect to the camera's control port. Returns latency in ms (raises OSError if unreachable)."""
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise OSError('Invalid camera URL')
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme, 554)
+        began = time.perf_counter()
+        with socket.create_connection((parts.hostname, port), timeout=2):
+            pass
+        return round((time.perf_counter() - began) * 1000, 1)
+
+    def _ffprobe(self, url):
+        """Full stream probe: codec, resolution, frame rate, audio parameters"""
+        command = ['ffprobe', '-v', 'error', '-show_streams', '-of', 'json']
+        if url.startswith('rtsp'):
+            command.extend(['-rtsp_transport', 'tcp', '-timeout', '5000000'])
+        command.append(url)
+
+        result = subprocess.run(command, capture_output=True, timeout=15)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', errors='ignore').strip()[-300:] or 'ffprobe failed')
+
+        params = {}
+        for stream in json.loads(result.stdout or b'{}').get('streams', []):
+            if stream.get('codec_type') == 'video' and 'video_codec' not in params:
+                params.update({
+                    'video_codec': stream.get('codec_name'),
+                    'profile': stream.get('profile'),
+                    'width': stream.get('width'),
+                    'height': stream.get('height'),
+                    'pix_fmt': stream.get('pix_fmt'),
+                    'frame_rate': parse_frame_rate(stream.get('avg_frame_rate')) or
+                                  parse_frame_rate(stream.get('r_frame_rate'))
+                })
+            elif stream.get('codec_type') == 'audio' and 'audio_codec' not in params:
+                params.update({
+                    'audio_codec': stream.get('codec_name'),
+                    'sample_rate': int(stream.get('sample_rate') or 0) or None,
+                    'channels': stream.get('channels')
+                })
+        if 'video_codec' not in params:
+            raise RuntimeError('No video stream found')
+        return params
+
+    def probe(self, url, full=False):
+        """Check one camera and update its record"""
+        with self.lock:
+            camera = self.cameras.get(url)
+            if camera is None:
+                return
+            was_reachable = camera['reachable']
+            params_age = time.time() - (camera.get('params_updated') or 0)
+            needs_params = full or not camera.get('params') or params_age > self.params_max_age
+
+        update = {'last_checked': time.time()}
+        try:
+            update['latency_ms'] = self._tcp_check(url)
+        except OSError as e:
+            update.update({'reachable': False, 'error': str(e)})
+        else:
+            update.update({'reachable': True, 'error': None})
+            # A camera that just came back may have rebooted with different settings
+            if needs_params or was_reachable is False:
+                try:
+                    update['params'] = self._ffprobe(url)
+                    update['params_updated'] = time.time()
+                except Exception as e:
+                    update['error'] = f'Probe failed: {e}'
+
+        with self.lock:
+            if url in self.cameras:
+                self.cameras[url].update(update)
+        if 'params' in update:
+            self.save()
+
+    def probe_all(self, full=False):
+        """Probe every camera concurrently and wait for the results"""
+        with self.lock:
+            urls = list(self.cameras)
+        list(self.executor.map(lambda url: self.probe(url, full), urls))
+
+    def _schedule(self):
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:
+                print(f"Error probing cameras: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        """Load saved cameras and start the background probe schedule (idempotent)"""
+        with self.lock:
+            if self._started:
+                return
+            self._started = True
+        self.load()
+        thread = threading.Thread(target=self._schedule, name='camera-registry', daemon=True)
+        thread.start()
+
+    # Start path
+
+    def check_reachable(self, url):
+        """Raise CameraUnreachableError if a recent probe found the camera unreachable"""
+        camera = self.get(url)
+        if not camera or camera['reachable'] is not False or not camera['last_checked']:
+            return
+        age = time.time() - camera['last_checked']
+        if age <= 2 * self.interval:
+            raise CameraUnreachableError(f"Camera unreachable ({camera['error']}, checked {int(age)}s ago)")
+
+    def input_options(self, url):
+        """FFmpeg input options for a fast start based on cached parameters (empty if unknown)"""
+        camera = self.get(url)
+        if not camera or not camera.get('params'):
+            return []
+        # Parameters are already known, so FFmpeg only needs enough data to sync on the stream.
+        # The frame rate is not forced on the input (-r would replace the camera's timestamps);
+        # the caller uses frame_rate() for the keyframe interval instead.
+        opts = ['-probesize', '262144', '-analyzeduration', '500000', '-fpsprobesize', '0']
+        if camera['params'].get('video_codec'):
+            opts = ['-c:v', camera['params']['video_codec']] + opts
+        return opts
+
+    def frame_rate(self, url):
+        camera = self.get(url)
+        if camera and camera.get('params'):
+            return camera['params'].get('frame_rate')
+        return None
+
+    def passthrough_blockers(self, url, resolution=None, audio_codec='opus'):
+        """Reasons the camera stream cannot be served as-is for the requested output
+
+        Probes the camera first if its codec parameters are not known yet, waiting for
+        the probe register() started instead of running a second one. Cameras that are
+        not registered yet are probed without being added; register() reuses the result.
+
+        Returns:
+            List of human-readable reasons; empty when MediaMTX can pull the camera directly.
+        """
+        scheme = urlsplit(url).scheme.lower()
+        if scheme not in PULL_SCHEMES:
+            return [f'MediaMTX cannot pull {scheme or "this"} sources']
+
+        camera = self.get(url)
+        if camera is None:
+            try:
+                params = self._ffprobe(url)
+                with self.lock:
+                    self._probed[url] = params
+                camera = {'params': params}
+            except Exception as e:
+                print(f"Error probing camera {mask_url(url)}: {e}")
+        elif not camera.get('params'):
+            with self.lock:
+                pending = self._pending.get(url)
+            if pending:
+                try:
+                    pending.result(timeout=20)
+                except Exception as e:
+                    print(f"Error probing camera {mask_url(url)}: {e}")
+            else:
+                self.probe(url, full=True)
+            camera = self.get(url)
+        params = (camera or {}).get('params')
+        if not params:
+            return ['camera codec parameters are unknown']
+
+        blockers = []
+        if params.get('video_codec') not in PASSTHROUGH_VIDEO_CODECS:
+            blockers.append(f"video codec {params.get('video_codec')} is not playable by every reader")
+        if resolution and resolution != f"{params.get('width')}:{params.get('height')}":
+            blockers.append(f'scaling to {resolution} requested')
+        camera_audio = params.get('audio_codec')
+        if camera_audio and camera_audio not in PASSTHROUGH_AUDIO_CODECS.get(audio_codec, ()):
+            blockers.append(f'audio codec {camera_audio} is not {audio_codec}')
+        return blockers
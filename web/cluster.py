@@ -0,0 +1,342 @@
+"""
+MediaMTX Stream Manager - Cluster Coordination
+Shared stream state, placement and failover for several manager + MediaMTX nodes
+
+Every node heartbeats into a shared store and records there which streams it runs.
+New streams are placed on the least-loaded live node (assigned streams relative to
+the node's capacity). When a node stops heartbeating, a surviving node moves its
+streams to the remaining nodes in one store transaction; each node's reconcile loop
+then starts the streams assigned to it and drops local streams assigned elsewhere.
+
+Stores are pluggable through open_cluster_store(url). The SQLite store relies on
+SQLite's file locking, so it suits nodes sharing one host or volume (local testing).
+Stream passwords never reach the store (only a digest, to detect spec changes), so a
+stream moved off a failed node restarts without its publish credentials.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+def least_loaded(nodes, counts):
+    """Pick the node with the lowest assigned-streams-to-capacity ratio after one more stream (None if no nodes)"""
+    if not nodes:
+        return None
+    return min(nodes, key=lambda node: ((counts.get(node['node_id'], 0) + 1) / max(node['capacity'], 0.001),
+                                        node['node_id']))
+
+# Stream spec fields never written to the shared store; only their digest is kept to detect changes
+SECRET_SPEC_FIELDS = ('auth_pass',)
+
+def store_spec(spec):
+    """Copy of a stream spec that is safe to share between nodes (secrets replaced by SHA-256 digests)"""
+    shared = dict(spec)
+    for field in SECRET_SPEC_FIELDS:
+        if field in shared:
+            value = shared.pop(field)
+            shared[f'{field}_sha256'] = hashlib.sha256(value.encode('utf-8')).hexdigest() if value else None
+    return shared
+
+class StreamAssignedError(Exception):
+    """Raised when a new stream's name is already assigned to another stream or node"""
+
+class ClusterStore(ABC):
+    """Shared cluster state backend"""
+
+    @abstractmethod
+    def heartbeat(self, node_id, url, capacity, running):
+        """Register a node or refresh its last-seen time and running-stream count"""
+
+    @abstractmethod
+    def nodes(self):
+        """All registered nodes as dicts with node_id, url, capacity, running and last_seen"""
+
+    @abstractmethod
+    def assignments(self):
+        """All stream assignments as dicts with name, stream_id, node_id, spec and updated"""
+
+    @abstractmethod
+    def assign(self, name, stream_id, node_id, spec):
+        """Record that a node runs a new stream
+
+        Re-recording the same stream on the same node only refreshes its spec. Raises
+        StreamAssignedError if the name is assigned to another stream or node; moving a
+        stream between nodes is left to fail_over().
+        """
+
+    @abstractmethod
+    def unassign(self, name, node_id):
+        """Remove a stream's assignment if it still belongs to the given node"""
+
+    @abstractmethod
+    def fail_over(self, node_timeout):
+        """Atomically move the streams of nodes silent for node_timeout seconds to live nodes
+
+        Returns:
+            List of (stream name, old node, new node).
+        """
+
+class SQLiteClusterStore(ClusterStore):
+    """Cluster store in a SQLite database file shared by all nodes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS nodes (
+            node_id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            capacity REAL NOT NULL,
+            running INTEGER NOT NULL DEFAULT 0,
+            last_seen REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS streams (
+            name TEXT PRIMARY KEY,
+            stream_id TEXT NOT NULL,
+            node_id TEXT NOT NULL,
+            spec TEXT NOT NULL,
+            updated REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self, write=False):
+        """Connection for one operation; write=True holds the database write lock until commit"""
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            if write:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            if write:
+                conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, node_id, url, capacity, running):
+        with self._connect(write=True) as conn:
+            conn.execute('INSERT INTO nodes (node_id, url, capacity, running, last_seen) VALUES (?, ?, ?, ?, ?) '
+                         'ON CONFLICT(node_id) DO UPDATE SET url = excluded.url, capacity = excluded.capacity, '
+                         'running = excluded.running, last_seen = excluded.last_seen',
+                         (node_id, url, capacity, running, time.time()))
+
+    def nodes(self):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute('SELECT * FROM nodes ORDER BY node_id')]
+
+    def assignments(self):
+        with self._connect() as conn:
+            rows = [dict(row) for row in conn.execute('SELECT * FROM streams ORDER BY name')]
+        for row in rows:
+            row['spec'] = json.loads(row['spec'])
+        return rows
+
+    def assign(self, name, stream_id, node_id, spec):
+        with self._connect(write=True) as conn:
+            try:
+                conn.execute('INSERT INTO streams (name, stream_id, node_id, spec, updated) VALUES (?, ?, ?, ?, ?)',
+                             (name, stream_id, node_id, json.dumps(spec), time.time()))
+            except sqlite3.IntegrityError:
+                existing = conn.execute('SELECT stream_id, node_id FROM streams WHERE name = ?', (name,)).fetchone()
+                if (existing['stream_id'], existing['node_id']) != (stream_id, node_id):
+                    raise StreamAssignedError(f"Stream {name} already runs on node {existing['node_id']}")
+                conn.execute('UPDATE streams SET spec = ?, updated = ? WHERE name = ?',
+                             (json.dumps(spec), time.time(), name))
+
+    def unassign(self, name, node_id):
+        with self._connect(write=True) as conn:
+            conn.execute('DELETE FROM streams WHERE name = ? AND node_id = ?', (name, node_id))
+
+    def fail_over(self, node_timeout):
+        moved = []
+        with self._connect(write=True) as conn:
+            now = time.time()
+            nodes = [dict(row) for row in conn.execute('SELECT * FROM nodes')]
+            dead = {node['node_id'] for node in nodes if now - node['last_seen'] > node_timeout}
+            alive = [node for node in nodes if node['node_id'] not in dead]
+            if not dead or not alive:
+                return moved
+
+            counts = {row['node_id']: row['count'] for row in
+                      conn.execute('SELECT node_id, COUNT(*) AS count FROM streams GROUP BY node_id')}
+            orphans = conn.execute('SELECT name, node_id FROM streams WHERE node_id IN (%s) ORDER BY name'
+                                   % ','.join('?' * len(dead)), sorted(dead)).fetchall()
+            for row in orphans:
+                target = least_loaded(alive, counts)
+                conn.execute('UPDATE streams SET node_id = ?, updated = ? WHERE name = ?',
+                             (target['node_id'], now, row['name']))
+                counts[target['node_id']] = counts.get(target['node_id'], 0) + 1
+                moved.append((row['name'], row['node_id'], target['node_id']))
+
+            conn.execute('DELETE FROM nodes WHERE node_id IN (%s)' % ','.join('?' * len(dead)), sorted(dead))
+        return moved
+
+# URL scheme -> store factory taking the parsed URL
+STORE_BACKENDS = {
+    'sqlite': lambda parts: SQLiteClusterStore(parts.path)
+}
+
+def open_cluster_store(url):
+    """Open a cluster store from a URL such as sqlite:///streams/cluster.db"""
+    parts = urlsplit(url)
+    backend = STORE_BACKENDS.get(parts.scheme)
+    if backend is None:
+        raise ValueError(f'Unsupported cluster backend: {parts.scheme or url} '
+                         f'(available: {", ".join(sorted(STORE_BACKENDS))})')
+    return backend(parts)
+
+class ClusterNode:
+    """This manager's membership in a cluster: heartbeat, placement, failover and reconciliation"""
+
+    def __init__(self, store, node_id, url, capacity, local_streams, start_stream, stop_stream,
+                 interval=5.0, node_timeout=None, retry_interval=60.0):
+        """
+        Args:
+            store: ClusterStore shared by all nodes.
+            node_id/url: This node's identity and the manager API URL other nodes forward requests to.
+            capacity: Relative encoder capacity (e.g. number of concurrent transcodes) used for placement.
+            local_streams: Callable returning {stream name: stream id} for streams active on this node.
+            start_stream: Callable(spec, stream_id) starting an assigned stream on this node.
+            stop_stream: Callable(stream_id) stopping a local stream.
+            interval: Seconds between heartbeats / reconcile passes.
+            node_timeout: Seconds without a heartbeat before a node's streams are moved (default 3 intervals).
+            retry_interval: Seconds before retrying an assigned stream that failed to start here.
+        """
+        self.store = store
+        self.node_id = node_id
+        self.url = url.rstrip('/')
+        self.capacity = capacity
+        self.local_streams = local_streams
+        self.start_stream = start_stream
+        self.stop_stream = stop_stream
+        self.interval = interval
+        self.node_timeout = node_timeout or 3 * interval
+        self.retry_interval = retry_interval
+        self.failed_starts = {}  # stream name -> monotonic time of the failed start
+        self._started = False
+        self._lock = threading.Lock()
+
+    # Placement
+
+    def live_nodes(self):
+        now = time.time()
+        return [node for node in self.store.nodes() if now - node['last_seen'] <= self.node_timeout]
+
+    def place(self):
+        """The live node a new stream should run on"""
+        return self.place_many(1)[0]
+
+    def place_many(self, count):
+        """Live nodes for count new streams, each placed as if the previous ones were already assigned"""
+        counts = {}
+        for assignment in self.store.assignments():
+            counts[assignment['node_id']] = counts.get(assignment['node_id'], 0) + 1
+        nodes = self.live_nodes()
+        placement = []
+        for _ in range(count):
+            node = least_loaded(nodes, counts)
+            if node:
+                counts[node['node_id']] = counts.get(node['node_id'], 0) + 1
+            placement.append(node)
+        return placement
+
+    def remote_assignments(self):
+        """Assignments of streams on other nodes, grouped by node id"""
+        by_node = {}
+        for assignment in self.store.assignments():
+            if assignment['node_id'] != self.node_id:
+                by_node.setdefault(assignment['node_id'], []).append(assignment)
+        return by_node
+
+    def find(self, name=None, stream_id=None):
+        """The assignment of a stream by name or id, or None"""
+        for assignment in self.store.assignments():
+            if assignment['name'] == name or (stream_id and assignment['stream_id'] == stream_id):
+                return assignment
+        return None
+
+    def node(self, node_id):
+        return next((node for node in self.store.nodes() if node['node_id'] == node_id), None)
+
+    def record(self, name, stream_id, spec):
+        self.store.assign(name, stream_id, self.node_id, store_spec(spec))
+
+    def forget(self, name):
+        self.store.unassign(name, self.node_id)
+
+    def status(self):
+        """Nodes with liveness and assigned-stream counts, and where each stream runs"""
+        assignments = self.store.assignments()
+        now = time.time()
+        nodes = []
+        for node in self.store.nodes():
+            node['alive'] = now - node['last_seen'] <= self.node_timeout
+            node['assigned'] = sum(1 for assignment in assignments if assignment['node_id'] == node['node_id'])
+            nodes.append(node)
+        streams = [{'name': a['name'], 'stream_id': a['stream_id'], 'node_id': a['node_id'], 'updated': a['updated']}
+                   for a in assignments]
+        return {'node_id': self.node_id, 'nodes': nodes, 'streams': streams}
+
+    # Reconciliation
+
+    def reconcile(self):
+        """One pass: heartbeat, move streams off dead nodes, then converge local streams on the assignments"""
+        running = self.local_streams()
+        self.store.heartbeat(self.node_id, self.url, self.capacity, len(running))
+
+        for name, old_node, new_node in self.store.fail_over(self.node_timeout):
+            print(f"Cluster: node {old_node} is down, moved stream {name} to {new_node}")
+
+        assignments = self.store.assignments()
+        mine = {a['name']: a for a in assignments if a['node_id'] == self.node_id}
+        elsewhere = {a['name'] for a in assignments if a['node_id'] != self.node_id}
+
+        # Streams that were moved away while this node was presumed dead must not run twice
+        for name, stream_id in running.items():
+            if name in elsewhere:
+                print(f"Cluster: stream {name} is assigned to another node, stopping local copy")
+                self.stop_stream(stream_id)
+
+        now = time.monotonic()
+        for name, assignment in mine.items():
+            if name in running or now - self.failed_starts.get(name, -self.retry_interval) < self.retry_interval:
+                continue
+            try:
+                print(f"Cluster: starting assigned stream {name}")
+                self.start_stream(assignment['spec'], assignment['stream_id'])
+                self.failed_starts.pop(name, None)
+            except Exception as e:
+                self.failed_starts[name] = now
+                print(f"Cluster: could not start assigned stream {name}: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Cluster reconcile error: {e}")
+
+    def start(self):
+        """Join the cluster and start the reconcile loop (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.store.heartbeat(self.node_id, self.url, self.capacity, 0)
+        thread = threading.Thread(target=self._run, name='cluster-node', daemon=True)
+        thread.start()
@@ -0,0 +1,189 @@
+"""
+MediaMTX Stream Manager - File Browser Backend
+Cached, paginated directory listings built with os.scandir
+
+Listings are cached per directory and invalidated by the directory mtime or a TTL.
+Scans run on a small worker pool; a request waits at most its time budget and gets
+whatever has been read so far, while the scan finishes in the background and fills
+the cache for the next request (useful on slow NAS mounts with huge directories).
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+def format_size(size_bytes):
+    """Format bytes to human-readable string"""
+    if size_bytes < 1024:
+        return f'{size_bytes} B'
+    elif size_bytes < 1024 * 1024:
+        return f'{size_bytes / 1024:.1f} KB'
+    elif size_bytes < 1024 * 1024 * 1024:
+        return f'{size_bytes / (1024 * 1024):.1f} MB'
+    return f'{size_bytes / (1024 * 1024 * 1024):.2f} GB'
+
+def sort_key(item):
+    """Directories first, then case-insensitive name"""
+    return (not item['is_dir'], item['name'].lower(), item['name'])
+
+def encode_cursor(item):
+    key = [item['is_dir'], item['name']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        is_dir, name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_key({'is_dir': bool(is_dir), 'name': str(name)})
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+class DirectoryScan:
+    """One in-progress or finished scan of a directory"""
+
+    def __init__(self, path, mtime_ns):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.items = []
+        self.complete = False
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.items)
+
+class FileBrowser:
+    """Directory listing service with scandir, TTL + mtime cache and time budgets"""
+
+    def __init__(self, allowed_extensions, ttl=30.0, max_entries=256, time_budget=2.0, workers=4):
+        self.allowed_extensions = allowed_extensions
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.time_budget = time_budget
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='file-browser')
+
+    def _scan(self, scan):
+        """Read a directory with a single scandir pass, stat-ing only video files"""
+        try:
+            with os.scandir(scan.path) as entries:
+                for entry in entries:
+                    try:
+                        # DirEntry.is_dir()/is_file() use d_type and avoid a stat per entry
+                        if entry.is_dir():
+                            item = {'name': entry.name, 'path': entry.path, 'is_dir': True}
+                        elif entry.is_file():
+                            ext = os.path.splitext(entry.name)[1].lower().lstrip('.')
+                            if ext not in self.allowed_extensions:
+                                continue
+                            size_bytes = entry.stat().st_size
+                            item = {'name': entry.name, 'path': entry.path, 'is_dir': False,
+                                    'size': format_size(size_bytes), 'size_bytes': size_bytes}
+                        else:
+                            continue
+                    except OSError:
+                        # Skip items we can't access
+                        continue
+
+                    with scan.lock:
+                        scan.items.append(item)
+
+            with scan.lock:
+                scan.items.sort(key=sort_key)
+                scan.complete = True
+                scan.finished_at = time.monotonic()
+
+            with self.lock:
+                self.cache[scan.path] = scan
+                self.cache.move_to_end(scan.path)
+                while len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+        finally:
+            with self.lock:
+                if self.in_flight.get(scan.path, (None,))[0] is scan:
+                    del self.in_flight[scan.path]
+
+    def _cached(self, path, mtime_ns):
+        with self.lock:
+            scan = self.cache.get(path)
+            if scan is None:
+                return None
+            if scan.mtime_ns != mtime_ns or time.monotonic() - scan.finished_at > self.ttl:
+                del self.cache[path]
+                return None
+            self.cache.move_to_end(path)
+            return scan
+
+    def invalidate(self, path=None):
+        """Drop one cached directory listing, or all of them"""
+        with self.lock:
+            if path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(path, None)
+
+    def list_directory(self, path, cursor=None, limit=DEFAULT_PAGE_SIZE, name_filter=None, time_budget=None):
+        """List one page of a directory
+
+        Raises FileNotFoundError, NotADirectoryError, PermissionError, or ValueError for a bad cursor.
+
+        Returns:
+            dict with items, next_cursor (None on the last page), total (matching items seen),
+            partial (True if the scan did not finish within the time budget) and cached.
+        """
+        stat_result = os.stat(path)
+        if not os.path.isdir(path):
+            raise NotADirectoryError(path)
+        # Fail fast instead of handing a permission error to a background scan
+        if not os.access(path, os.R_OK | os.X_OK):
+            raise PermissionError(path)
+
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+
+        scan = self._cached(path, stat_result.st_mtime_ns)
+        cached = scan is not None
+        if scan is None:
+            with self.lock:
+                scan, future = self.in_flight.get(path, (None, None))
+                if scan is None or scan.mtime_ns != stat_result.st_mtime_ns:
+                    scan = DirectoryScan(path, stat_result.st_mtime_ns)
+                    future = self.executor.submit(self._scan, scan)
+                    self.in_flight[path] = (scan, future)
+
+            try:
+                future.result(timeout=self.time_budget if time_budget is None else time_budget)
+            except FutureTimeoutError:
+                pass
+
+        items = scan.snapshot()
+        partial = not scan.complete
+        if partial:
+            items.sort(key=sort_key)
+
+        if name_filter:
+            needle = name_filter.lower()
+            items = [item for item in items if needle in item['name'].lower()]
+
+        total = len(items)
+        if after is not None:
+            items = [item for item in items if sort_key(item) > after]
+
+        page = items[:limit]
+        has_more = len(items) > limit
+        return {
+            'items': page,
+            'next_cursor': encode_cursor(page[-1]) if has_more and page else None,
+            'total': total,
+            'partial': partial,
+            'cached': cached
+        }
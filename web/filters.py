@@ -0,0 +1,252 @@
+"""
+MediaMTX Stream Manager - Video Filter Pipelines
+Validated per-stream filter steps compiled to a single FFmpeg filter graph per encoder family
+
+Steps run in the order given, in the same FFmpeg process as the encode. With hardware
+acceleration the whole graph uses the family's GPU filters (frames are decoded into GPU
+memory and never downloaded); overlay images are uploaded once and composited on the GPU.
+
+    [{"type": "deinterlace"},
+     {"type": "fps", "fps": 30},
+     {"type": "scale", "width": 1280, "height": 720},
+     {"type": "overlay", "image": "logo.png", "position": "top-right", "margin": 16}]
+"""
+
+import os
+import struct
+
+FILTER_TYPES = ('deinterlace', 'fps', 'scale', 'overlay')
+MAX_FILTER_STEPS = 8
+MAX_OVERLAYS = 4
+OVERLAY_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp'}
+
+# Overlay position -> (x, y) expressions; W/H are the video size, w/h the image size
+OVERLAY_POSITIONS = {
+    'top-left': ('{m}', '{m}'),
+    'top-right': ('W-w-{m}', '{m}'),
+    'bottom-left': ('{m}', 'H-h-{m}'),
+    'bottom-right': ('W-w-{m}', 'H-h-{m}'),
+    'center': ('(W-w)/2', '(H-h)/2')
+}
+
+# The same positions as integers for GPU overlays: FFmpeg before 6.0 (e.g. Debian bookworm's 5.1)
+# only accepts plain numbers for overlay_cuda/overlay_vaapi/overlay_qsv offsets
+OVERLAY_OFFSETS = {
+    'top-left': lambda W, H, w, h, m: (m, m),
+    'top-right': lambda W, H, w, h, m: (W - w - m, m),
+    'bottom-left': lambda W, H, w, h, m: (m, H - h - m),
+    'bottom-right': lambda W, H, w, h, m: (W - w - m, H - h - m),
+    'center': lambda W, H, w, h, m: ((W - w) // 2, (H - h) // 2)
+}
+
+# Compositing filter and overlay image preparation per encoder family (None = software)
+OVERLAY_FILTERS = {
+    None: ('overlay', None),
+    'nvenc': ('overlay_cuda', 'format=yuva420p,hwupload_cuda'),
+    'vaapi': ('overlay_vaapi', 'format=rgba,hwupload'),
+    'qsv': ('overlay_qsv', 'format=bgra,hwupload=extra_hw_frames=16,format=qsv')
+}
+
+def _number(value, name, minimum, maximum, integer=False):
+    try:
+        number = int(value) if integer else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name}: {value!r}')
+    if not minimum <= number <= maximum:
+        raise ValueError(f'{name} must be between {minimum} and {maximum}')
+    return number
+
+def image_size(path):
+    """(width, height) of a PNG, JPEG or BMP image, read from its header"""
+    with open(path, 'rb') as f:
+        header = f.read(26)
+        if header.startswith(b'\x89PNG\r\n\x1a\n'):
+            return struct.unpack('>II', header[16:24])
+        if header.startswith(b'BM'):
+            width, height = struct.unpack('<ii', header[18:26])
+            return width, abs(height)
+        if header.startswith(b'\xff\xd8'):
+            # Walk the JPEG segments up to the start-of-frame marker that holds the size
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xff:
+                    break
+                length = struct.unpack('>H', f.read(2))[0]
+                if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    raise ValueError(f'Cannot read the size of overlay image {os.path.basename(path)}')
+
+def validate_filters(steps, resolve_image=None):
+    """Validate and normalize a list of filter steps
+
+    Args:
+        steps: List of step dicts (see module docstring); None or [] for no filters.
+        resolve_image: Callable mapping an overlay image value to a file path
+            (e.g. relative names against the media folder). Defaults to the value itself.
+
+    Returns:
+        Normalized list of steps. Raises ValueError for invalid steps or missing images.
+    """
+    if not steps:
+        return []
+    if not isinstance(steps, list):
+        raise ValueError('filters must be a list of filter steps')
+    if len(steps) > MAX_FILTER_STEPS:
+        raise ValueError(f'At most {MAX_FILTER_STEPS} filter steps are allowed')
+
+    normalized = []
+    for index, step in enumerate(steps, 1):
+        kind = step.get('type') if isinstance(step, dict) else None
+        if kind not in FILTER_TYPES:
+            raise ValueError(f'Filter {index}: unknown type {kind!r} (use {", ".join(FILTER_TYPES)})')
+
+        if kind in ('deinterlace', 'fps') and any(other['type'] == kind for other in normalized):
+            raise ValueError(f'Filter {index}: {kind} can only be used once')
+
+        if kind == 'deinterlace':
+            # Progressive frames in mixed content pass through untouched unless told otherwise
+            normalized.append({'type': kind, 'only_interlaced': bool(step.get('only_interlaced', True))})
+        elif kind == 'fps':
+            normalized.append({'type': kind, 'fps': _number(step.get('fps'), 'fps', 1, 120)})
+        elif kind == 'scale':
+            width = _number(step.get('width'), 'width', 16, 7680, integer=True)
+            height = _number(step.get('height'), 'height', 16, 4320, integer=True)
+            if width % 2 or height % 2:
+                raise ValueError(f'Filter {index}: width and height must be even')
+            normalized.append({'type': kind, 'width': width, 'height': height})
+        else:
+            image = step.get('image')
+            if not image or not isinstance(image, str):
+                raise ValueError(f'Filter {index}: overlay image is required')
+            if os.path.splitext(image)[1].lower().lstrip('.') not in OVERLAY_IMAGE_EXTENSIONS:
+                raise ValueError(f'Filter {index}: overlay image must be one of '
+                                 f'{", ".join(sorted(OVERLAY_IMAGE_EXTENSIONS))}')
+            path = resolve_image(image) if resolve_image else image
+            if not os.path.isfile(path):
+                raise ValueError(f'Filter {index}: overlay image not found: {image}')
+
+            position = step.get('position', 'top-right')
+            if position not in OVERLAY_POSITIONS:
+                raise ValueError(f'Filter {index}: unknown position {position!r} '
+                                 f'(use {", ".join(OVERLAY_POSITIONS)})')
+            normalized.append({'type': kind, 'image': path, 'position': position,
+                               'margin': _number(step.get('margin', 16), 'margin', 0, 1000, integer=True)})
+
+    if sum(1 for step in normalized if step['type'] == 'overlay') > MAX_OVERLAYS:
+        raise ValueError(f'At most {MAX_OVERLAYS} overlays are allowed')
+    return normalized
+
+def output_frame_rate(steps):
+    """Frame rate forced by an fps step, or None to keep the source rate"""
+    for step in steps or []:
+        if step['type'] == 'fps':
+            return step['fps']
+    return None
+
+def output_resolution(steps):
+    """'width:height' of the last scale step, or None when the steps don't scale"""
+    scales = [step for step in steps or [] if step['type'] == 'scale']
+    return f"{scales[-1]['width']}:{scales[-1]['height']}" if scales else None
+
+def _video_filter(step, hw_accel):
+    """One chain filter for an encoder family"""
+    if step['type'] == 'deinterlace':
+        deint = 'interlaced' if step['only_interlaced'] else 'all'
+        if hw_accel == 'nvenc':
+            return f'yadif_cuda=mode=send_frame:deint={deint}'
+        if hw_accel == 'vaapi':
+            return 'deinterlace_vaapi=auto=1' if step['only_interlaced'] else 'deinterlace_vaapi'
+        if hw_accel == 'qsv':
+            # vpp_qsv has no interlaced-only mode; it would deinterlace progressive frames as well
+            if step['only_interlaced']:
+                raise ValueError('QuickSync deinterlaces every frame; set only_interlaced to false '
+                                 'or use another hardware acceleration')
+            return 'vpp_qsv=deinterlace=2'
+        return f'yadif=mode=send_frame:deint={deint}'
+
+    if step['type'] == 'fps':
+        # fps only drops/duplicates frames, so it works on GPU frames as well
+        return f"fps={step['fps']:g}"
+
+    width, height = step['width'], step['height']
+    if hw_accel == 'vaapi':
+        return f'scale_vaapi=w={width}:h={height}'
+    if hw_accel == 'qsv':
+        return f'scale_qsv=w={width}:h={height}'
+    if hw_accel == 'nvenc':
+        return f'scale_cuda={width}:{height}'
+    return f'scale={width}:{height}'
+
+def compile_filter_graph(steps, resolution=None, hw_accel=None):
+    """Compile filter steps (plus the stream's output resolution) for one encoder family
+
+    The resolution becomes a scale step unless the steps scale explicitly; it is placed
+    before the first overlay so overlay positions and sizes are in output pixels. GPU
+    overlays get integer offsets, so apart from top-left they need the frame size from a
+    preceding scale step (or the resolution); otherwise a ValueError is raised.
+
+    Returns:
+        dict with 'inputs' (extra FFmpeg inputs for overlay images, placed after the main
+        input) and 'options' (output options: a plain -vf chain, or -filter_complex with
+        explicit -map when overlays are used). Both are empty when there is nothing to do.
+    """
+    steps = list(steps or [])
+    if resolution and not any(step['type'] == 'scale' for step in steps):
+        width, height = (int(value) for value in str(resolution).split(':'))
+        first_overlay = next((i for i, step in enumerate(steps) if step['type'] == 'overlay'), len(steps))
+        steps.insert(first_overlay, {'type': 'scale', 'width': width, 'height': height})
+
+    overlays = [step for step in steps if step['type'] == 'overlay']
+    if not overlays:
+        chain = [_video_filter(step, hw_accel) for step in steps]
+        return {'inputs': [], 'options': ['-vf', ','.join(chain)] if chain else []}
+
+    overlay_filter, prepare_image = OVERLAY_FILTERS[hw_accel]
+    inputs = []
+    graph = []
+    chain = []
+    label = '0:v'
+    frame_size = None
+
+    def flush_chain():
+        nonlocal label, chain
+        if chain:
+            graph.append(f"[{label}]{','.join(chain)}[v{len(graph)}]")
+            label = f'v{len(graph) - 1}'
+            chain = []
+
+    for step in steps:
+        if step['type'] != 'overlay':
+            chain.append(_video_filter(step, hw_accel))
+            if step['type'] == 'scale':
+                frame_size = (step['width'], step['height'])
+            continue
+
+        flush_chain()
+        inputs.extend(['-i', step['image']])
+        image_label = f'{len(inputs) // 2}:v'
+        if prepare_image:
+            graph.append(f'[{image_label}]{prepare_image}[img{len(inputs) // 2}]')
+            image_label = f'img{len(inputs) // 2}'
+
+        if hw_accel is None:
+            x, y = (value.format(m=step['margin']) for value in OVERLAY_POSITIONS[step['position']])
+        elif step['position'] == 'top-left':
+            x = y = step['margin']
+        elif frame_size is None:
+            raise ValueError(f"GPU overlays at {step['position']} need a known frame size: "
+                             f'set a resolution or add a scale step before the overlay')
+        else:
+            offsets = OVERLAY_OFFSETS[step['position']](*frame_size, *image_size(step['image']), step['margin'])
+            x, y = (max(0, offset) for offset in offsets)
+        graph.append(f'[{label}][{image_label}]{overlay_filter}=x={x}:y={y}[v{len(graph)}]')
+        label = f'v{len(graph) - 1}'
+
+    flush_chain()
+    return {
+        'inputs': inputs,
+        'options': ['-filter_complex', ';'.join(graph), '-map', f'[{label}]', '-map', '0:a?']
+    }
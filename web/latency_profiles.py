@@ -0,0 +1,138 @@
+"""
+MediaMTX Stream Manager - Latency Profiles
+Named encoder tuning profiles that derive GOP, B-frames, lookahead and VBV
+size from the source frame rate and the MediaMTX HLS segment settings
+"""
+
+import os
+
+DEFAULT_LATENCY_PROFILE = 'balanced'
+DEFAULT_FRAME_RATE = 30.0
+
+# Must match hlsSegmentDuration / hlsPartDuration in mediamtx.yml
+HLS_SEGMENT_DURATION = float(os.getenv('HLS_SEGMENT_DURATION', '1.0'))
+HLS_PART_DURATION = float(os.getenv('HLS_PART_DURATION', '0.2'))
+
+# gop_segments: keyframe interval in HLS segments, so every segment starts on a keyframe
+# bufsize_seconds: VBV buffer expressed in seconds of the target bitrate
+LATENCY_PROFILES = {
+    'ultra-low': {
+        'description': 'Smallest possible delay for WebRTC/RTSP monitoring; lowest compression efficiency',
+        'gop_segments': 1,
+        'b_frames': 0,
+        'lookahead': 0,
+        'bufsize_seconds': 0.5,
+        'x264_preset': 'superfast',
+        'x264_tune': 'zerolatency',
+        'nvenc_tune': 'ull'
+    },
+    'low': {
+        'description': 'Low delay for interactive viewing and LL-HLS',
+        'gop_segments': 1,
+        'b_frames': 0,
+        'lookahead': 0,
+        'bufsize_seconds': 1.0,
+        'x264_preset': 'veryfast',
+        'x264_tune': 'zerolatency',
+        'nvenc_tune': 'll'
+    },
+    'balanced': {
+        # Keeps the pre-profile encoder settings (zerolatency, no lookahead, 2s VBV) for existing streams
+        'description': 'Default: segment-aligned keyframes with zero-latency encoding',
+        'gop_segments': 2,
+        'b_frames': 0,
+        'lookahead': 0,
+        'bufsize_seconds': 2.0,
+        'x264_preset': 'veryfast',
+        'x264_tune': 'zerolatency',
+        'nvenc_tune': 'll'
+    },
+    'quality': {
+        'description': 'Best quality per bit for catalog/VOD-style channels; highest delay. '
+                       'Uses B-frames, which WebRTC readers cannot play',
+        'gop_segments': 4,
+        'b_frames': 3,
+        'lookahead': 40,
+        'bufsize_seconds': 4.0,
+        'x264_preset': 'faster',
+        'x264_tune': None,
+        'nvenc_tune': 'hq'
+    }
+}
+
+def webrtc_compatible(profile):
+    """WebRTC readers can't play streams with B-frames"""
+    return profile['b_frames'] == 0
+
+def resolve_latency_profile(name, frame_rate=None, segment_duration=None, part_duration=None):
+    """Resolve a named profile into concrete encoder settings for a source frame rate
+
+    Returns:
+        dict with gop (frames), b_frames, lookahead (frames), bufsize_seconds, presets/tunes
+        and an 'expected_latency' estimate. Raises ValueError for unknown profile names.
+    """
+    name = name or DEFAULT_LATENCY_PROFILE
+    if name not in LATENCY_PROFILES:
+        raise ValueError(f'Unknown latency profile: {name}')
+
+    profile = LATENCY_PROFILES[name]
+    frame_rate = frame_rate or DEFAULT_FRAME_RATE
+    segment_duration = segment_duration or HLS_SEGMENT_DURATION
+    part_duration = part_duration or HLS_PART_DURATION
+
+    gop_seconds = segment_duration * profile['gop_segments']
+    gop = max(1, round(frame_rate * gop_seconds))
+
+    settings = dict(profile)
+    settings.update({
+        'name': name,
+        'frame_rate': round(frame_rate, 3),
+        'gop': gop,
+        'expected_latency': estimate_latency(profile, frame_rate, gop_seconds, part_duration)
+    })
+    return settings
+
+def estimate_latency(profile, frame_rate, gop_seconds, part_duration):
+    """Estimate glass-to-glass latency in seconds for real-time and LL-HLS viewers"""
+    # Frames held back by the encoder for B-frame reordering and rate-control lookahead
+    encoder_delay = (profile['b_frames'] + profile['lookahead']) / frame_rate
+    # Worst-case VBV buffering plus capture/network/decode overhead
+    pipeline_delay = encoder_delay + profile['bufsize_seconds'] / 2 + 0.15
+
+    return {
+        'realtime_seconds': round(pipeline_delay, 2),
+        # LL-HLS players hold back three parts behind the one being assembled
+        'll_hls_seconds': round(pipeline_delay + 3 * part_duration + part_duration, 2),
+        # A new viewer has to wait for the next keyframe before decoding starts
+        'startup_seconds': round(gop_seconds, 2)
+    }
+
+def latency_video_opts(settings, hw_accel=None):
+    """Encoder options implementing a resolved profile for the given encoder family"""
+    gop = str(settings['gop'])
+    b_frames = str(settings['b_frames'])
+    lookahead = settings['lookahead']
+
+    if hw_accel == 'nvenc':
+        opts = ['-tune', settings['nvenc_tune'], '-g', gop, '-bf', b_frames,
+                '-no-scenecut', '1', '-forced-idr', '1']
+        if lookahead:
+            opts.extend(['-rc-lookahead', str(lookahead)])
+        return opts
+
+    if hw_accel == 'qsv':
+        # No -look_ahead: h264_qsv then picks look-ahead rate control over the CBR/QVBR
+        # that rate_control_opts asks for, and the bitrate is no longer constant or capped
+        return ['-g', gop, '-bf', b_frames, '-idr_interval', '0']
+
+    if hw_accel == 'vaapi':
+        return ['-g', gop, '-bf', b_frames, '-idr_interval', '0']
+
+    # Software encoder (libx264); fixed GOP with scene-cut keyframes disabled
+    opts = ['-preset', settings['x264_preset']]
+    if settings['x264_tune']:
+        opts.extend(['-tune', settings['x264_tune']])
+    opts.extend(['-g', gop, '-keyint_min', gop, '-sc_threshold', '0', '-bf', b_frames])
+    if lookahead:
+        opts.extend(['-rc-lookahead', str(lookahead)])
+    return opts
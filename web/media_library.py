@@ -0,0 +1,316 @@
+"""
+MediaMTX Stream Manager - Media Library
+In-memory index of media files under one or more roots, kept current by inotify
+
+The index is built once with a recursive os.scandir walk and then updated from
+inotify events (Linux, via ctypes - no extra dependency). Where inotify is not
+available the library falls back to a periodic full rescan. List and search
+queries are answered from memory: prefix search uses bisect over the sorted
+relative paths, so /streams can hold tens of thousands of assets.
+"""
+
+import bisect
+import ctypes
+import ctypes.util
+import os
+import struct
+import threading
+import time
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+def _load_inotify():
+    """Return libc with inotify symbols, or None when unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class MediaLibrary:
+    """Recursive media index over a set of roots"""
+
+    def __init__(self, roots, extensions, primary_root=None, rescan_interval=60.0):
+        """
+        Args:
+            roots: Directories to index recursively.
+            extensions: Allowed file extensions (without dot).
+            primary_root: Files under this root are reported by relative path (what the start
+                API resolves against UPLOAD_FOLDER); files under other roots by absolute path.
+            rescan_interval: Seconds between full rescans when inotify is unavailable.
+        """
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.extensions = {ext.lower() for ext in extensions}
+        self.primary_root = os.path.realpath(primary_root) if primary_root else None
+        self.rescan_interval = rescan_interval
+
+        self.lock = threading.Lock()
+        self.entries = {}       # absolute path -> entry
+        self.sorted_keys = []   # sorted (key, absolute path)
+        self.ready = threading.Event()
+        self.watching = False
+
+        self._inotify_fd = None
+        self._watches = {}      # watch descriptor -> directory
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    # Index maintenance
+
+    def _key(self, path):
+        """Sort/search key: the value reported as 'file', lowercased"""
+        return self._file_value(path).lower()
+
+    def _file_value(self, path):
+        if self.primary_root and (path + os.sep).startswith(self.primary_root + os.sep):
+            return os.path.relpath(path, self.primary_root)
+        return path
+
+    def _is_media(self, name):
+        return os.path.splitext(name)[1].lower().lstrip('.') in self.extensions
+
+    def _add(self, path, stat_result):
+        entry = {
+            'name': os.path.basename(path),
+            'file': self._file_value(path),
+            'path': path,
+            'extension': os.path.splitext(path)[1].lower().lstrip('.'),
+            'size_bytes': stat_result.st_size,
+            'modified': stat_result.st_mtime
+        }
+        with self.lock:
+            if path not in self.entries:
+                bisect.insort(self.sorted_keys, (self._key(path), path))
+            self.entries[path] = entry
+
+    def _remove(self, path):
+        with self.lock:
+            if self.entries.pop(path, None) is None:
+                return
+            index = bisect.bisect_left(self.sorted_keys, (self._key(path), path))
+            if index < len(self.sorted_keys) and self.sorted_keys[index][1] == path:
+                del self.sorted_keys[index]
+
+    def _remove_tree(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self.lock:
+            doomed = [path for path in self.entries if path.startswith(prefix)]
+        for path in doomed:
+            self._remove(path)
+
+    def _scan_tree(self, directory, found=None):
+        """Walk a directory tree, adding media files and watching every directory"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            self._watch(current)
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file() and self._is_media(entry.name):
+                                self._add(entry.path, entry.stat())
+                                if found is not None:
+                                    found.add(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def rebuild(self):
+        """Full rescan of every root; drops entries that no longer exist"""
+        found = set()
+        for root in self.roots:
+            if os.path.isdir(root):
+                self._scan_tree(root, found)
+
+        with self.lock:
+            stale = [path for path in self.entries if path not in found]
+        for path in stale:
+            self._remove(path)
+        self.ready.set()
+
+    def add_file(self, path):
+        """Index a single file immediately (e.g. right after an upload)"""
+        path = os.path.realpath(path)
+        if self._is_media(path):
+            try:
+                self._add(path, os.stat(path))
+            except OSError:
+                pass
+
+    # inotify
+
+    def _watch(self, directory):
+        if self._inotify_fd is None:
+            return
+        wd = self._libc.inotify_add_watch(self._inotify_fd, directory.encode(), WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+
+    def _unwatch_tree(self, directory):
+        """Drop the watches of a directory and its subdirectories (e.g. after it was moved away)
+
+        A moved directory keeps its inotify watches, still labelled with the old paths; if it
+        moved within the roots, _scan_tree watches it again under the new path.
+        """
+        prefix = directory.rstrip(os.sep) + os.sep
+        for wd, watched in list(self._watches.items()):
+            if watched == directory or watched.startswith(prefix):
+                del self._watches[wd]
+                self._libc.inotify_rm_watch(self._inotify_fd, wd)
+
+    def _handle_event(self, wd, mask, name):
+        directory = self._watches.get(wd)
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped; only a full rescan can recover
+            self.rebuild()
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if directory is None:
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # Subdirectories are handled through their parent's DELETE/MOVED_FROM event
+            if directory in self.roots:
+                self._remove_tree(directory)
+            return
+
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._scan_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if mask & IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+                self._remove_tree(path)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self._remove(path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            # IN_CREATE alone is ignored: uploads are indexed once they are fully written
+            self.add_file(path)
+
+    def _read_events(self):
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 64 * 1024)
+            except OSError as e:
+                print(f"Media library watcher stopped: {e}")
+                self.watching = False
+                self._poll_loop()
+                return
+
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].split(b'\0', 1)[0].decode('utf-8', errors='surrogateescape')
+                offset += length
+                try:
+                    self._handle_event(wd, mask, name)
+                except Exception as e:
+                    print(f"Error handling media library event for {name}: {e}")
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.rescan_interval)
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Error rescanning media library: {e}")
+
+    def start(self):
+        """Build the index in the background and keep it current (idempotent)"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+
+        self._libc = _load_inotify()
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_CLOEXEC)
+            if fd >= 0:
+                self._inotify_fd = fd
+                self.watching = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Error building media library index: {e}")
+                self.ready.set()
+            print(f"Media library indexed {len(self.entries)} files"
+                  f" ({'inotify' if self.watching else 'polling'})")
+            if self.watching:
+                self._read_events()
+            else:
+                self._poll_loop()
+
+        thread = threading.Thread(target=run, name='media-library', daemon=True)
+        thread.start()
+
+    # Queries
+
+    def search(self, prefix=None, query=None, extensions=None, limit=None, offset=0):
+        """Query the index
+
+        Args:
+            prefix: Case-insensitive prefix of the reported file value (e.g. 'promos/').
+            query: Case-insensitive substring of the file name.
+            extensions: Iterable of extensions to keep.
+            limit/offset: Page through the sorted results.
+
+        Returns:
+            (entries, total matching)
+        """
+        extensions = {ext.lower().lstrip('.') for ext in extensions} if extensions else None
+        query = query.lower() if query else None
+
+        with self.lock:
+            if prefix:
+                prefix = prefix.lower()
+                start = bisect.bisect_left(self.sorted_keys, (prefix, ''))
+                candidates = []
+                for key, path in self.sorted_keys[start:]:
+                    if not key.startswith(prefix):
+                        break
+                    candidates.append(path)
+            else:
+                candidates = [path for _, path in self.sorted_keys]
+
+            matches = []
+            for path in candidates:
+                entry = self.entries[path]
+                if extensions and entry['extension'] not in extensions:
+                    continue
+                if query and query not in entry['name'].lower():
+                    continue
+                matches.append(entry)
+
+        total = len(matches)
+        offset = max(0, offset or 0)
+        if limit:
+            return matches[offset:offset + limit], total
+        return matches[offset:], total
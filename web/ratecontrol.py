@@ -0,0 +1,141 @@
+"""
+MediaMTX Stream Manager - Rate Control
+Bitrate parsing/validation and matched maxrate/bufsize settings per encoder family
+"""
+
+import re
+
+RATE_CONTROL_MODES = ('cbr', 'capped-crf')
+DEFAULT_RATE_CONTROL = 'cbr'
+
+# Default constant-quality value per encoder family (lower is better quality)
+DEFAULT_QUALITY = {
+    None: 23,       # libx264 -crf
+    'nvenc': 23,    # -cq
+    'qsv': 25,      # -global_quality
+    'vaapi': 25     # -global_quality (QVBR)
+}
+
+# (max frame height, min bps, max bps) - anything outside is wasted bandwidth or unwatchable
+RESOLUTION_TIERS = [
+    (360, 200_000, 2_000_000),
+    (480, 300_000, 4_000_000),
+    (720, 500_000, 8_000_000),
+    (1080, 1_000_000, 15_000_000),
+    (1440, 2_000_000, 30_000_000),
+    (2160, 4_000_000, 60_000_000)
+]
+# Bounds used when the output keeps the source resolution
+ABSOLUTE_BITRATE_RANGE = (100_000, 60_000_000)
+
+_BITRATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:bps|b)?\s*$', re.IGNORECASE)
+_UNIT_MULTIPLIERS = {'': 1, 'k': 1_000, 'm': 1_000_000, 'g': 1_000_000_000}
+
+def parse_bitrate(value):
+    """Parse a bitrate such as '2M', '2500k', '1.5M', '800kbps' or 2000000 into bits per second"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        bps = int(value)
+    else:
+        match = _BITRATE_PATTERN.match(str(value or ''))
+        if not match:
+            raise ValueError(f'Invalid bitrate: {value!r} (use e.g. 2M, 2500k or 1.5M)')
+        bps = int(float(match.group(1)) * _UNIT_MULTIPLIERS[match.group(2).lower()])
+
+    if bps <= 0:
+        raise ValueError(f'Invalid bitrate: {value!r}')
+    return bps
+
+def format_bitrate(bps):
+    """Format bits per second in FFmpeg notation ('2M', '2500k', '1500k')"""
+    if bps % 1_000_000 == 0:
+        return f'{bps // 1_000_000}M'
+    if bps % 1_000 == 0:
+        return f'{bps // 1_000}k'
+    return str(bps)
+
+def bitrate_range(resolution=None):
+    """Allowed (min, max) bitrate in bps for a 'W:H' resolution, or the absolute range for the source resolution"""
+    if not resolution:
+        return ABSOLUTE_BITRATE_RANGE
+
+    try:
+        height = int(str(resolution).split(':')[1])
+    except (IndexError, ValueError):
+        raise ValueError(f'Invalid resolution: {resolution!r} (use WIDTH:HEIGHT)')
+
+    for max_height, min_bps, max_bps in RESOLUTION_TIERS:
+        if height <= max_height:
+            return min_bps, max_bps
+    return RESOLUTION_TIERS[-1][1], RESOLUTION_TIERS[-1][2]
+
+def clamp_bitrate(bitrate, resolution=None):
+    """Bring a bitrate inside the range for a resolution (settings saved before the ranges existed)
+
+    Returns:
+        (bitrate in FFmpeg notation, True if it had to be changed)
+    """
+    bps = parse_bitrate(bitrate)
+    min_bps, max_bps = bitrate_range(resolution)
+    clamped = min(max(bps, min_bps), max_bps)
+    return format_bitrate(clamped), clamped != bps
+
+def validate_rate_control(bitrate, resolution=None, mode=None, quality=None):
+    """Validate stream rate-control settings
+
+    Returns:
+        (bps, mode, quality) with defaults applied. Raises ValueError on bad input.
+    """
+    bps = parse_bitrate(bitrate)
+    min_bps, max_bps = bitrate_range(resolution)
+    if not min_bps <= bps <= max_bps:
+        raise ValueError(f'Bitrate {format_bitrate(bps)} is outside the {format_bitrate(min_bps)}-'
+                         f'{format_bitrate(max_bps)} range for resolution {resolution or "Original"}')
+
+    mode = mode or DEFAULT_RATE_CONTROL
+    if mode not in RATE_CONTROL_MODES:
+        raise ValueError(f'Unknown rate control mode: {mode} (use {" or ".join(RATE_CONTROL_MODES)})')
+
+    if quality is not None:
+        try:
+            quality = int(quality)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid quality: {quality!r}')
+        if not 1 <= quality <= 51:
+            raise ValueError('Quality must be between 1 and 51')
+
+    return bps, mode, quality
+
+def rate_control_opts(bitrate, hw_accel=None, mode=None, quality=None, bufsize_seconds=2.0):
+    """FFmpeg rate-control options for an encoder family
+
+    cbr pins bitrate and maxrate to the requested value. capped-crf encodes at constant
+    quality and uses the requested bitrate only as a VBV-enforced ceiling, so simple
+    content costs less bandwidth.
+    """
+    bps = parse_bitrate(bitrate)
+    mode = mode or DEFAULT_RATE_CONTROL
+    quality = str(quality if quality is not None else DEFAULT_QUALITY.get(hw_accel, 23))
+    rate = format_bitrate(bps)
+    bufsize = format_bitrate(max(1_000, int(bps * bufsize_seconds) // 1_000 * 1_000))
+
+    if hw_accel == 'nvenc':
+        if mode == 'capped-crf':
+            return ['-rc', 'vbr', '-cq', quality, '-b:v', '0', '-maxrate', rate, '-bufsize', bufsize]
+        return ['-rc', 'cbr', '-b:v', rate, '-maxrate', rate, '-bufsize', bufsize]
+
+    if hw_accel == 'vaapi':
+        if mode == 'capped-crf':
+            return ['-rc_mode', 'QVBR', '-global_quality', quality, '-b:v', rate, '-maxrate', rate, '-bufsize', bufsize]
+        return ['-rc_mode', 'CBR', '-b:v', rate, '-maxrate', rate, '-bufsize', bufsize]
+
+    if hw_accel == 'qsv':
+        if mode == 'capped-crf':
+            # h264_qsv selects QVBR for -global_quality with a maxrate above -b:v (equal rates would mean CBR)
+            return ['-global_quality', quality, '-b:v', format_bitrate(bps * 7 // 10 // 1_000 * 1_000),
+                    '-maxrate', rate, '-bufsize', bufsize]
+        return ['-b:v', rate, '-maxrate', rate, '-bufsize', bufsize]
+
+    # Software encoder (libx264)
+    if mode == 'capped-crf':
+        return ['-crf', quality, '-maxrate', rate, '-bufsize', bufsize]
+    return ['-b:v', rate, '-maxrate', rate, '-bufsize', bufsize]
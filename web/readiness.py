@@ -0,0 +1,257 @@
+"""
+MediaMTX Stream Manager - Stream Readiness
+Per-stream readiness state machine driven by FFmpeg progress and MediaMTX path state
+
+    spawned -> connecting -> publishing -> ready <-> degraded
+
+spawned: the publisher process exists. connecting: FFmpeg has opened its input and is
+connecting to MediaMTX. publishing: FFmpeg reports encoded frames (-progress pipe:1).
+ready: MediaMTX reports the path ready for this run (it went from not ready to ready after
+the spawn, or its readyTime is new), and a run whose progress is tracked is publishing, so
+readers can play it. degraded: a ready
+stream whose path stopped being ready, whose FFmpeg stopped reporting progress or
+that encodes slower than realtime; it returns to ready once that clears.
+
+Forward states may be skipped (paths fed by another publisher go straight from
+connecting to ready) and never go backwards before ready.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+READINESS_STATES = ('spawned', 'connecting', 'publishing', 'ready', 'degraded')
+
+# Upper bounds (seconds) of the time-to-ready histogram buckets
+TIME_TO_READY_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+
+STALL_SECONDS = 5.0  # No FFmpeg progress for this long marks a ready stream degraded
+DEGRADED_SPEED = 0.9  # Encoding speed (x realtime) below which a ready stream is degraded
+READY_TIME_SKEW = 5.0  # Seconds MediaMTX's clock may lag ours when its readyTime is compared with the spawn time
+
+PROGRESS_FIELDS = ('frame', 'fps', 'bitrate', 'out_time', 'speed', 'drop_frames', 'dup_frames')
+
+def parse_ready_time(value):
+    """Epoch seconds from a MediaMTX timestamp such as 2026-01-08T10:00:00.123456789Z (None if absent)"""
+    if not value:
+        return None
+    try:
+        # MediaMTX prints nanoseconds; datetime only takes microseconds
+        value = re.sub(r'(\.\d{6})\d+', r'\1', value)
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+class Histogram:
+    """Cumulative-bucket histogram of durations plus recent samples for percentiles"""
+
+    def __init__(self, buckets=TIME_TO_READY_BUCKETS, recent=500):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self.samples.append(value)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+
+    def snapshot(self, slo_seconds=None):
+        """Counts per bucket ('le' upper bounds, cumulative), sum, percentiles and SLO attainment"""
+        with self._lock:
+            ordered = sorted(self.samples)
+            result = {
+                'count': self.count,
+                'sum': round(self.total, 3),
+                'buckets': {f'{bound:g}': count for bound, count in zip(self.buckets, self.counts)},
+                'p50': round(ordered[len(ordered) // 2], 3) if ordered else None,
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3) if ordered else None,
+                'max': round(ordered[-1], 3) if ordered else None
+            }
+            result['buckets']['+Inf'] = self.count
+        if slo_seconds is not None:
+            result['slo_seconds'] = slo_seconds
+            result['within_slo'] = (round(sum(1 for value in ordered if value <= slo_seconds) / len(ordered), 3)
+                                    if ordered else None)
+        return result
+
+class StreamReadiness:
+    """Readiness of one publisher run; a new instance is created for every (re)start"""
+
+    def __init__(self, state='spawned', tracks_progress=True):
+        """
+        Args:
+            state: Initial state ('connecting' for paths fed by another publisher).
+            tracks_progress: Whether FFmpeg progress is read for this stream; stalls only
+                count towards degraded when it is.
+        """
+        self.state = state
+        self.tracks_progress = tracks_progress
+        self.started = time.monotonic()
+        self.spawned_at = time.time()  # Wall clock, to compare with MediaMTX's readyTime
+        self._path_was_down = False  # MediaMTX listed the path as not ready since the spawn
+        self._stale_ready_time = None  # readyTime of a session that was already ready when first seen
+        self._seen_stale = False
+        self.changed_at = time.time()
+        self.time_to_ready = None
+        self.reason = None
+        self.progress = {}
+        self.last_progress = None
+        self.stderr = deque(maxlen=50)
+        self.exited = False
+        self._settled = threading.Event()  # Set once ready or exited
+        self._lock = threading.Lock()
+
+    def _set(self, state, reason=None):
+        if state != self.state:
+            self.state = state
+            self.changed_at = time.time()
+        self.reason = reason
+
+    def advance(self, state):
+        """Move forward to a pre-ready state; ignored if the stream is already past it"""
+        with self._lock:
+            if READINESS_STATES.index(state) > READINESS_STATES.index(self.state) and self.state not in ('ready', 'degraded'):
+                self._set(state)
+
+    def stderr_line(self, line):
+        self.stderr.append(line)
+        # FFmpeg prints the input description once the input is open; next it connects to MediaMTX
+        if line.startswith('Input #'):
+            self.advance('connecting')
+
+    def progress_block(self, fields):
+        """One -progress report (key=value pairs up to 'progress=continue|end')"""
+        progress = {key: fields[key] for key in PROGRESS_FIELDS if key in fields}
+        try:
+            progress['speed'] = float(progress['speed'].rstrip('x'))
+        except (KeyError, ValueError):
+            progress['speed'] = None
+        with self._lock:
+            self.progress = progress
+            self.last_progress = time.monotonic()
+        if fields.get('frame', '0') not in ('0', '') or fields.get('out_time_us', '0') not in ('0', 'N/A', ''):
+            self.advance('publishing')
+
+    def _fresh_path(self, path_ready, ready_time):
+        """Whether a ready path is published by this run rather than left over from before it
+
+        Transitions seen after the spawn decide this without comparing clocks. Only a path that
+        is already ready when first seen falls back to its readyTime, with READY_TIME_SKEW
+        allowed for MediaMTX's clock; if that looks older, a new readyTime (a new session)
+        still counts.
+        """
+        if not path_ready:
+            self._path_was_down = True
+            return False
+        if self._path_was_down:
+            return True
+        if not self._seen_stale:
+            if ready_time is not None and ready_time >= self.spawned_at - READY_TIME_SKEW:
+                return True
+            self._seen_stale = True
+            self._stale_ready_time = ready_time
+            return False
+        return ready_time != self._stale_ready_time
+
+    def update(self, path_ready, ready_time=None):
+        """Apply MediaMTX path state
+
+        Args:
+            path_ready: Whether MediaMTX lists the path as ready (False when it is not listed).
+            ready_time: When the path became ready (epoch seconds), or None if not reported.
+
+        Returns:
+            True when the stream just became ready. A path that was already ready before
+            this run was spawned (a previous or another publisher) does not count, nor does
+            one whose tracked FFmpeg has not reported frames yet.
+        """
+        with self._lock:
+            if self.exited:
+                return False
+            now = time.monotonic()
+            if self.state not in ('ready', 'degraded'):
+                if not self._fresh_path(path_ready, ready_time):
+                    return False
+                if self.tracks_progress and self.state != 'publishing':
+                    return False
+                self.time_to_ready = round(now - self.started, 3)
+                self._set('ready')
+                self._settled.set()
+                return True
+
+            problems = []
+            if not path_ready:
+                problems.append('MediaMTX path is not ready')
+            if self.tracks_progress and self.last_progress is not None:
+                if now - self.last_progress > STALL_SECONDS:
+                    problems.append(f'no FFmpeg progress for {now - self.last_progress:.0f}s')
+                elif self.progress.get('speed') is not None and self.progress['speed'] < DEGRADED_SPEED:
+                    problems.append(f"encoding at {self.progress['speed']:g}x realtime")
+            self._set('degraded' if problems else 'ready', '; '.join(problems) or None)
+            return False
+
+    def close(self):
+        """The publisher exited; wake anyone waiting for readiness"""
+        with self._lock:
+            self.exited = True
+        self._settled.set()
+
+    def wait(self, timeout):
+        """Block until ready, exited or timeout. Returns True if the stream is ready."""
+        self._settled.wait(timeout)
+        return self.state in ('ready', 'degraded') and not self.exited
+
+    def error_tail(self, limit=1000):
+        """Last stderr output, for failure messages"""
+        return '\n'.join(self.stderr)[-limit:]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'since': self.changed_at,
+                'time_to_ready': self.time_to_ready,
+                'reason': self.reason,
+                'progress': dict(self.progress)
+            }
+
+def _read_progress(pipe, readiness):
+    fields = {}
+    for raw in iter(pipe.readline, b''):
+        key, _, value = raw.decode('utf-8', errors='ignore').strip().partition('=')
+        fields[key] = value
+        if key == 'progress':
+            readiness.progress_block(fields)
+            fields = {}
+    pipe.close()
+
+def _read_stderr(pipe, readiness):
+    for raw in iter(pipe.readline, b''):
+        readiness.stderr_line(raw.decode('utf-8', errors='ignore').rstrip())
+    pipe.close()
+
+def follow_process(process, readiness):
+    """Drain a publisher's stdout (-progress pipe:1) and stderr into its readiness
+
+    Both pipes must be read continuously: a full pipe buffer blocks FFmpeg mid-stream.
+
+    Returns:
+        The reader threads, to join after the process exits.
+    """
+    threads = []
+    for pipe, reader in ((process.stdout, _read_progress), (process.stderr, _read_stderr)):
+        if pipe is None:
+            continue
+        thread = threading.Thread(target=reader, args=(pipe, readiness), daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,21 @@
+#!/bin/bash
+# Container entry point
+#   SERVE_MODE=development (default): Flask development server, single process
+#   SERVE_MODE=production: one stream supervisor + gunicorn API workers relaying to it
+
+if [ "${SERVE_MODE:-development}" != "production" ]; then
+    exec python app.py
+fi
+
+python supervisor.py &
+gunicorn --workers "${API_WORKERS:-4}" --threads "${API_THREADS:-8}" \
+    --bind 0.0.0.0:5000 --timeout 120 wsgi:application &
+
+trap 'kill -TERM $(jobs -p) 2>/dev/null' TERM INT
+
+# If either process dies, exit so the container restart policy brings both back
+wait -n
+status=$?
+kill -TERM $(jobs -p) 2>/dev/null
+wait
+exit $status
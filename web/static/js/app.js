@@ -97,6 +97,12 @@ function setupEventListeners() {
         protocolSelect.addEventListener('change', updateProtocolRecommendation);
     }
 
+    // Only offer bitrates the server accepts for the chosen output resolution
+    const resolutionSelect = document.getElementById('resolution');
+    if (resolutionSelect) {
+        resolutionSelect.addEventListener('change', updateBitrateOptions);
+    }
+
     // Authentication toggle
     const enableAuthCheckbox = document.getElementById('enableAuth');
     const authSection = document.getElementById('authSection');
@@ -138,9 +144,31 @@ function openModal() {
 function closeModalDialog() {
     modal.style.display = 'none';
     streamForm.reset();
+    updateBitrateOptions();
     document.getElementById('uploadProgress').style.display = 'none';
 }
 
+function updateBitrateOptions() {
+    const bitrateSelect = document.getElementById('bitrate');
+    const resolution = document.getElementById('resolution').value;
+    // [max frame height, min bps, max bps] per tier, from RESOLUTION_TIERS in ratecontrol.py
+    const tiers = JSON.parse(bitrateSelect.dataset.tiers || '[]');
+    const height = resolution ? parseInt(resolution.split(':')[1], 10) : null;
+    const tier = height ? (tiers.find(([maxHeight]) => height <= maxHeight) || tiers[tiers.length - 1]) : null;
+
+    const options = Array.from(bitrateSelect.options);
+    options.forEach(option => {
+        const bps = parseFloat(option.value) * 1000000;
+        option.disabled = Boolean(tier) && (bps < tier[1] || bps > tier[2]);
+    });
+    if (bitrateSelect.selectedOptions[0] && bitrateSelect.selectedOptions[0].disabled) {
+        const allowed = options.filter(option => !option.disabled);
+        if (allowed.length) {
+            bitrateSelect.value = allowed[allowed.length - 1].value;
+        }
+    }
+}
+
 function updateProtocolRecommendation() {
     const protocol = document.getElementById('protocol').value;
     const useCaseSpan = document.getElementById('protocolUseCase');
@@ -224,7 +252,8 @@ function createStreamCard(stream) {
     const protocolUpper = stream.protocol.toUpperCase();
 
     let actionsHTML = '';
-    if (stream.status === 'running' || stream.status === 'starting') {
+    const isIdle = stream.status === 'idle';
+    if (stream.status === 'running' || stream.status === 'starting' || isIdle) {
         actionsHTML = `
             <button class="btn btn-danger" onclick="stopStream('${stream.id}')">
                 <span class="icon">⏹</span> Stop
@@ -244,7 +273,8 @@ function createStreamCard(stream) {
     // Get health status indicator
     const metrics = stream.live_metrics || {};
     const healthStatus = metrics.health_status || 'unknown';
-    const healthEmoji = healthStatus === 'healthy' ? '🟢' : healthStatus === 'waiting' ? '🟡' : '🔴';
+    const healthEmoji = healthStatus === 'healthy' ? '🟢' : healthStatus === 'waiting' ? '🟡' : healthStatus === 'degraded' ? '🟠' : '🔴';
+    const readiness = stream.readiness;
 
     // Build metrics HTML
     let metricsHTML = '';
@@ -301,11 +331,23 @@ function createStreamCard(stream) {
                 <span class="info-label">Resolution</span>
                 <span class="info-value">${stream.resolution}</span>
             </div>
+            ${readiness ? `
+            <div class="info-row">
+                <span class="info-label">Readiness</span>
+                <span class="info-value">${readiness.state}${readiness.time_to_ready !== null ? ` (live in ${readiness.time_to_ready}s)` : ''}${readiness.reason ? ` - ${escapeHtml(readiness.reason)}` : ''}</span>
+            </div>
+            ` : ''}
+            ${stream.on_demand ? `
+            <div class="info-row">
+                <span class="info-label">Warm-up</span>
+                <span class="info-value">${stream.on_demand.last_warmup_seconds !== null ? stream.on_demand.last_warmup_seconds + 's' : 'N/A'} (${stream.on_demand.activations} activations)</span>
+            </div>
+            ` : ''}
         </div>
 
         ${metricsHTML}
 
-        ${stream.status === 'running' ? `
+        ${stream.status === 'running' || isIdle ? `
             <div class="stream-urls">
                 <div class="url-section">
                     <strong>Available Playback URLs:</strong>
@@ -368,7 +410,23 @@ async function handleStreamSubmit(e) {
     const resolution = document.getElementById('resolution').value;
     const hwAccel = document.getElementById('hwAccel').value;
     const audioCodec = document.getElementById('audioCodec').value;
+    const latencyProfile = document.getElementById('latencyProfile').value;
+    const rateControl = document.getElementById('rateControl').value;
+    const cameraMode = document.getElementById('cameraMode').value;
     const enableRecording = document.getElementById('enableRecording').checked;
+    const onDemand = document.getElementById('onDemand').checked;
+    const outputFps = document.getElementById('outputFps').value;
+    const deinterlace = document.getElementById('deinterlace').checked;
+
+    // Filter steps run in order: deinterlace before frame rate conversion
+    const filters = [];
+    if (deinterlace) {
+        // QuickSync can't skip progressive frames, so it deinterlaces every frame
+        filters.push({ type: 'deinterlace', only_interlaced: hwAccel !== 'qsv' });
+    }
+    if (outputFps) {
+        filters.push({ type: 'fps', fps: parseInt(outputFps, 10) });
+    }
     const enableAuth = document.getElementById('enableAuth').checked;
     const authUser = enableAuth ? document.getElementById('authUser').value.trim() : null;
     const authPass = enableAuth ? document.getElementById('authPass').value : null;
@@ -422,7 +480,12 @@ async function handleStreamSubmit(e) {
                 resolution: resolution || null,
                 hw_accel: hwAccel || null,
                 audio_codec: audioCodec || 'opus',
+                latency_profile: latencyProfile || 'balanced',
+                rate_control: rateControl || 'cbr',
+                camera_mode: cameraMode || 'transcode',
                 enable_recording: enableRecording,
+                on_demand: onDemand,
+                filters: filters,
                 auth_user: authUser,
                 auth_pass: authPass
             })
@@ -698,16 +761,18 @@ function selectBrowsedFile() {
     }
 }
 
-async function browsePath(path) {
+async function browsePath(path, cursor = null) {
     try {
-        fileList.innerHTML = '<div class="loading">Loading...</div>';
+        if (!cursor) {
+            fileList.innerHTML = '<div class="loading">Loading...</div>';
+        }
 
         const response = await fetch(`${API_BASE}/files/browse`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ path: path })
+            body: JSON.stringify({ path: path, cursor: cursor })
         });
 
         const data = await response.json();
@@ -715,7 +780,8 @@ async function browsePath(path) {
         if (data.success) {
             currentBrowserPath = data.path;
             renderBreadcrumb(data.path);
-            renderFileList(data.items);
+            renderFileList(data.items, Boolean(cursor));
+            renderLoadMore(data);
         } else {
             fileList.innerHTML = `<div class="error-message">${escapeHtml(data.error)}</div>`;
             showNotification(`Failed to browse: ${data.error}`, 'error');
@@ -754,10 +820,32 @@ function renderBreadcrumb(path) {
     });
 }
 
-function renderFileList(items) {
-    fileList.innerHTML = '';
+function renderLoadMore(data) {
+    // Large or slow directories are returned in pages; partial means the server is still scanning
+    if (!data.next_cursor && !data.partial) {
+        return;
+    }
+
+    const moreDiv = document.createElement('div');
+    moreDiv.className = 'file-item load-more';
+    moreDiv.innerHTML = `<span class="file-item-name">${data.next_cursor ? 'Load more...' : 'Still scanning - click to refresh'}</span>`;
+    moreDiv.addEventListener('click', () => {
+        moreDiv.remove();
+        if (data.next_cursor) {
+            browsePath(data.path, data.next_cursor);
+        } else {
+            browsePath(data.path);
+        }
+    });
+    fileList.appendChild(moreDiv);
+}
+
+function renderFileList(items, append = false) {
+    if (!append) {
+        fileList.innerHTML = '';
+    }
 
-    if (items.length === 0) {
+    if (items.length === 0 && !append) {
         fileList.innerHTML = '<div class="loading">No files or directories found</div>';
         return;
     }
@@ -0,0 +1,120 @@
+"""
+MediaMTX Stream Manager - Stream Supervisor
+Production serving: one process owns every FFmpeg process, API workers talk to it over IPC
+
+Stream state (active_streams, FFmpeg processes, shared sources, camera probing, cluster
+membership) lives in module globals of app.py, so it must exist exactly once. The same
+goes for the media library index and the file browser cache: each copy would walk and
+inotify-watch every media root. In production this module runs as that single
+supervisor process and serves the stream-management and media index routes on a Unix
+socket. The public API runs under gunicorn with any number of workers (see wsgi.py):
+each worker answers the stateless routes itself (UI, uploads, recordings) and relays
+the rest to the supervisor, so UI and upload traffic scales with the workers and never
+queues behind stream operations.
+
+Usage:
+    python supervisor.py &
+    gunicorn --workers 4 --threads 8 --bind 0.0.0.0:5000 wsgi:application
+"""
+
+import http.client
+import json
+import os
+import socket
+from urllib.parse import quote, urlsplit
+
+SUPERVISOR_ADDRESS = os.getenv('SUPERVISOR_ADDRESS', 'unix:///tmp/stream-supervisor.sock')
+
+# Routes that touch stream state or the media index and are therefore served by the supervisor
+SUPERVISOR_ROUTES = ('/api/streams', '/api/cameras', '/api/shared-sources', '/api/cluster', '/api/obs',
+                     '/api/media/list', '/api/files')
+
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te',
+                      'trailers', 'transfer-encoding', 'upgrade'}
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket"""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+def open_connection(address, timeout):
+    """Connection to the supervisor at 'unix:///path/to.sock' or 'http://host:port'"""
+    if address.startswith('unix://'):
+        return UnixHTTPConnection(address.partition('://')[2], timeout)
+    parts = urlsplit(address)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+
+class SupervisorProxy:
+    """WSGI middleware for API workers: serves stateless routes locally and relays stream routes to the supervisor"""
+
+    def __init__(self, app, address=SUPERVISOR_ADDRESS, timeout=60):
+        self.app = app
+        self.address = address
+        self.timeout = timeout
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(SUPERVISOR_ROUTES):
+            return self.forward(environ, start_response)
+        return self.app(environ, start_response)
+
+    def forward(self, environ, start_response):
+        path = quote(environ.get('PATH_INFO', '').encode('latin-1'), safe="/:@!$&'()*+,;=-._~")
+        if environ.get('QUERY_STRING'):
+            path += '?' + environ['QUERY_STRING']
+
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else None
+
+        headers = {key[5:].replace('_', '-').title(): value for key, value in environ.items()
+                   if key.startswith('HTTP_') and key[5:].replace('_', '-').lower() not in HOP_BY_HOP_HEADERS}
+        if environ.get('CONTENT_TYPE'):
+            headers['Content-Type'] = environ['CONTENT_TYPE']
+
+        connection = open_connection(self.address, self.timeout)
+        try:
+            connection.request(environ['REQUEST_METHOD'], path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except OSError as e:
+            payload = json.dumps({'success': False, 'error': f'Stream supervisor unavailable: {e}'}).encode('utf-8')
+            start_response('503 SERVICE UNAVAILABLE', [('Content-Type', 'application/json'),
+                                                       ('Content-Length', str(len(payload)))])
+            return [payload]
+        finally:
+            connection.close()
+
+        response_headers = [(name, value) for name, value in response.getheaders()
+                            if name.lower() not in HOP_BY_HOP_HEADERS]
+        start_response(f'{response.status} {response.reason}', response_headers)
+        return [data]
+
+def serve_supervisor(address=SUPERVISOR_ADDRESS):
+    """Run the single stream-owning process, serving the stream routes on the IPC address"""
+    from werkzeug.serving import make_server
+    from app import app, get_media_library, start_manager
+
+    # Build the media library index in the background; API workers never build their own
+    get_media_library()
+    start_manager()
+
+    if address.startswith('unix://'):
+        server = make_server(address, 0, app, threaded=True)
+        # API workers may run as a different user inside the container
+        os.chmod(address.partition('://')[2], 0o660)
+    else:
+        parts = urlsplit(address)
+        server = make_server(parts.hostname, parts.port, app, threaded=True)
+
+    print(f"Stream supervisor listening on {address}")
+    server.serve_forever()
+
+if __name__ == '__main__':
+    serve_supervisor()
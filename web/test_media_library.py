@@ -0,0 +1,69 @@
+"""
+Tests for the inotify-maintained media library index
+
+Run from web/: python -m unittest test_media_library
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from media_library import MediaLibrary
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true; the index is updated by the watcher thread"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+class MediaLibraryWatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmp.name)
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        for path in ('a/z.mp4', 'a/b/y.MKV', 'top.mp4'):
+            open(os.path.join(self.root, path), 'wb').close()
+
+        self.library = MediaLibrary([self.root], {'mp4', 'mkv'}, primary_root=self.root)
+        self.library.start()
+        self.assertTrue(self.library.ready.wait(5))
+        if not self.library.watching:
+            self.skipTest('inotify is not available')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def files(self):
+        entries, _ = self.library.search()
+        return sorted(entry['file'] for entry in entries)
+
+    def test_initial_scan(self):
+        self.assertEqual(self.files(), ['a/b/y.MKV', 'a/z.mp4', 'top.mp4'])
+
+    def test_directory_rename_reindexes_tree(self):
+        os.rename(os.path.join(self.root, 'a'), os.path.join(self.root, 'q'))
+        expected = ['q/b/y.MKV', 'q/z.mp4', 'top.mp4']
+        self.assertTrue(wait_for(lambda: self.files() == expected), self.files())
+
+        # Watches follow the new paths: changes inside the moved tree are picked up there
+        open(os.path.join(self.root, 'q', 'b', 'new.mp4'), 'wb').close()
+        self.assertTrue(wait_for(lambda: 'q/b/new.mp4' in self.files()), self.files())
+        self.assertNotIn('a/b/new.mp4', self.files())
+
+    def test_directory_moved_out_of_root_is_dropped(self):
+        with tempfile.TemporaryDirectory() as outside:
+            os.rename(os.path.join(self.root, 'a'), os.path.join(outside, 'a'))
+            self.assertTrue(wait_for(lambda: self.files() == ['top.mp4']), self.files())
+
+            # Writes in the moved-away tree must not reappear under the old path
+            open(os.path.join(outside, 'a', 'late.mp4'), 'wb').close()
+            time.sleep(0.3)
+            self.assertEqual(self.files(), ['top.mp4'])
+
+if __name__ == '__main__':
+    unittest.main()
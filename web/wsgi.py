@@ -0,0 +1,12 @@
+"""
+MediaMTX Stream Manager - WSGI Entry Point
+Production API workers; stream-management routes are relayed to supervisor.py
+
+Run with:
+    gunicorn --workers 4 --threads 8 --bind 0.0.0.0:5000 wsgi:application
+"""
+
+from app import app
+from supervisor import SUPERVISOR_ADDRESS, SupervisorProxy
+
+application = SupervisorProxy(app, SUPERVISOR_ADDRESS)